@@ -0,0 +1,156 @@
+"""
+Audio Cache Module
+Cache LRU dei dati PCM decodificati, con pre-caricamento in background
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+
+class AudioCache:
+    """Cache LRU di audio decodificato, indicizzata per percorso e data di modifica"""
+
+    def __init__(self, loader: Callable[[str], Any], budget_bytes: int = 1024 * 1024 * 1024):
+        self.loader = loader  # Funzione filepath -> buffer decodificato (con attributo nbytes)
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()  # (path, mtime) -> buffer decodificato
+        self.pending = {}  # (path, mtime) -> threading.Event per decodifiche in corso
+        self.lock = threading.Lock()
+        self.warm_thread = None
+        self._warm_generation = 0
+
+    @staticmethod
+    def _make_key(filepath: str) -> Optional[tuple]:
+        """Chiave di cache: percorso assoluto + mtime (un file modificato viene ridecodificato)"""
+        try:
+            return (os.path.abspath(filepath), os.path.getmtime(filepath))
+        except OSError:
+            return None
+
+    def get(self, filepath: str) -> Optional[Any]:
+        """Ritorna l'audio se già in cache, senza decodificare"""
+        key = self._make_key(filepath)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def load(self, filepath: str) -> Any:
+        """Ritorna l'audio dalla cache, decodificandolo se assente"""
+        entry, _ = self._load(filepath)
+        return entry
+
+    def _load(self, filepath: str, protected: frozenset = frozenset()) -> tuple:
+        """Carica con deduplica delle decodifiche concorrenti; ritorna (entry, in_cache)"""
+        key = self._make_key(filepath)
+        if key is None:
+            raise FileNotFoundError(f"File non trovato: {filepath}")
+
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    return entry, True
+
+                event = self.pending.get(key)
+                if event is None:
+                    # Nessuno sta decodificando questo file: ce ne occupiamo noi
+                    event = threading.Event()
+                    self.pending[key] = event
+                    break
+
+            # Un altro thread sta già decodificando lo stesso file: attendi il risultato
+            event.wait()
+            with self.lock:
+                if key in self.entries or key in self.pending:
+                    continue
+            # La decodifica dell'altro thread non è finita in cache: riprova in proprio
+
+        try:
+            entry = self.loader(filepath)
+            stored = self._store(key, entry, protected)
+            return entry, stored
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+            event.set()
+
+    def _store(self, key: tuple, entry: Any, protected: frozenset) -> bool:
+        """Inserisce in cache liberando spazio secondo LRU; le chiavi protette non vengono rimosse"""
+        size = entry.nbytes
+        with self.lock:
+            # Rimuovi versioni precedenti dello stesso file (mtime diverso)
+            for old_key in [k for k in self.entries if k[0] == key[0]]:
+                self._evict(old_key)
+
+            if size > self.budget_bytes:
+                return False
+
+            # Libera spazio partendo dalle voci usate meno di recente
+            for old_key in list(self.entries):
+                if self.used_bytes + size <= self.budget_bytes:
+                    break
+                if old_key not in protected:
+                    self._evict(old_key)
+
+            if self.used_bytes + size > self.budget_bytes:
+                return False
+
+            self.entries[key] = entry
+            self.used_bytes += size
+            return True
+
+    def _evict(self, key: tuple):
+        """Rimuove una voce dalla cache (chiamare con il lock acquisito)"""
+        entry = self.entries.pop(key)
+        self.used_bytes -= entry.nbytes
+
+    def warm(self, filepaths: Iterable[str], skip: Optional[Callable[[str], bool]] = None):
+        """Decodifica in background tutti i file indicati, nell'ordine dato
+        
+        skip, se indicato, viene valutato nel thread di background ed esclude i file per cui
+        ritorna True.
+        """
+        filepaths = list(filepaths)
+        with self.lock:
+            self._warm_generation += 1
+            generation = self._warm_generation
+
+        def warm_loop():
+            warmed = set()
+            for filepath in filepaths:
+                # Un nuovo warm (es. nuova playlist) annulla quello in corso
+                if generation != self._warm_generation:
+                    return
+                key = self._make_key(filepath)
+                if key is None or key in warmed:
+                    continue
+                if skip is not None and skip(filepath):
+                    continue
+                try:
+                    entry, stored = self._load(filepath, frozenset(warmed))
+                except Exception as e:
+                    print(f"Errore pre-caricamento {filepath}: {e}")
+                    continue
+                if not stored and entry.nbytes > self.budget_bytes:
+                    # File più grande dell'intero budget: non entrerà mai, passa ai successivi
+                    continue
+                if not stored:
+                    # Budget esaurito dalle tracce di questa playlist: inutile proseguire
+                    return
+                warmed.add(key)
+
+        self.warm_thread = threading.Thread(target=warm_loop, daemon=True)
+        self.warm_thread.start()
+
+    def clear(self):
+        """Svuota la cache"""
+        with self.lock:
+            self._warm_generation += 1
+            self.entries.clear()
+            self.used_bytes = 0
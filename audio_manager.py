@@ -7,189 +7,1353 @@ import sounddevice as sd
 import numpy as np
 import wave
 import os
-from typing import Optional, Tuple
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple
 import threading
+import time
 import queue
+from collections import deque
+from audio_cache import AudioCache
+from resampler import StreamResampler, resample
+
+
+def _to_float32(audio_data: np.ndarray) -> np.ndarray:
+    """Normalizza i campioni in float32 [-1, 1]; non copia se sono già float32"""
+    if audio_data.dtype == np.int16:
+        return audio_data.astype(np.float32) / 32768.0
+    if audio_data.dtype == np.int32:
+        return audio_data.astype(np.float32) / 2147483648.0
+    if audio_data.dtype == np.uint8:
+        return (audio_data.astype(np.float32) - 128.0) / 128.0
+    return audio_data.astype(np.float32, copy=False)
+
+
+class PCMBuffer:
+    """Audio decodificato immutabile, condiviso in sola lettura tra le uscite"""
+    
+    def __init__(self, audio_data: np.ndarray, sample_rate: int):
+        data = _to_float32(audio_data)
+        if data.ndim == 1:
+            data = data.reshape((-1, 1))
+        # Vista in sola lettura: nessuna uscita può modificare i campioni condivisi
+        data = data.view()
+        data.flags.writeable = False
+        self.data = data
+        self.sample_rate = sample_rate
+        
+    @property
+    def frames(self) -> int:
+        """Numero di frame (campioni per canale)"""
+        return self.data.shape[0]
+    
+    @property
+    def channels(self) -> int:
+        """Numero di canali"""
+        return self.data.shape[1]
+    
+    @property
+    def nbytes(self) -> int:
+        """Memoria occupata dai campioni"""
+        return self.data.nbytes
+    
+    def read_into(self, out: np.ndarray, start: int, frames: int, gain: float = 1.0) -> int:
+        """Scrive in out[:n] i frame [start, start + frames) moltiplicati per gain; ritorna n"""
+        chunk = self.data[start:start + frames]
+        n = len(chunk)
+        np.multiply(chunk, gain, out=out[:n])
+        return n
+    
+    def iter_blocks(self, block_frames: int) -> Iterator[np.ndarray]:
+        """Tutto l'audio a blocchi float32 di block_frames (l'ultimo può essere più corto)
+        
+        Il blocco può essere riutilizzato all'iterazione successiva: va consumato subito.
+        """
+        for start in range(0, self.frames, block_frames):
+            yield self.data[start:start + block_frames]
+    
+    def prepare(self, start: int):
+        """Annuncia che la riproduzione partirà dal frame start"""
+        pass
+    
+    def set_loop(self, loop: bool, start: int, end: int):
+        """Annuncia la regione ripetuta [start, end) (end 0 = fine del file)"""
+        pass
+    
+    def wait_ready(self, timeout: float = 0.5) -> bool:
+        """Attende che i primi frame siano disponibili"""
+        return True
+    
+    def release(self):
+        """Libera le risorse non condivise (il buffer non verrà più letto)"""
+        pass
+
+
+class MappedWavBuffer(PCMBuffer):
+    """WAV PCM letto tramite memory-map: converte in float32 solo i frame richiesti"""
+    
+    _SCALES = {1: 1.0 / 128.0, 2: 1.0 / 32768.0, 4: 1.0 / 2147483648.0}
+    _DTYPES = {1: np.uint8, 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+    
+    def __init__(self, filepath: str, data_offset: int, n_frames: int,
+                 n_channels: int, sample_width: int, sample_rate: int):
+        if sample_width not in self._DTYPES:
+            raise Exception(f"Sample width non supportato: {sample_width}")
+        # I dati restano su disco: il sistema operativo carica solo le pagine lette
+        self.raw = np.memmap(filepath, dtype=self._DTYPES[sample_width], mode='r',
+                             offset=data_offset, shape=(n_frames, n_channels))
+        self.sample_rate = sample_rate
+        self.scale = np.float32(self._SCALES[sample_width])
+        self.unsigned = sample_width == 1
+        
+    @property
+    def data(self) -> Optional[np.ndarray]:
+        """Nessun array float32 completo: i campioni vengono convertiti a blocchi"""
+        return None
+        
+    @property
+    def frames(self) -> int:
+        return self.raw.shape[0]
+    
+    @property
+    def channels(self) -> int:
+        return self.raw.shape[1]
+    
+    @property
+    def nbytes(self) -> int:
+        """Nessuna memoria allocata: le pagine mappate sono gestite dal sistema operativo"""
+        return 0
+    
+    def read_into(self, out: np.ndarray, start: int, frames: int, gain: float = 1.0) -> int:
+        chunk = self.raw[start:start + frames]
+        n = len(chunk)
+        self._convert(chunk, out[:n], gain)
+        return n
+    
+    def iter_blocks(self, block_frames: int) -> Iterator[np.ndarray]:
+        dest = np.empty((block_frames, self.channels), dtype=np.float32)
+        for start in range(0, self.frames, block_frames):
+            n = self.read_into(dest, start, block_frames)
+            yield dest[:n]
+    
+    def _convert(self, chunk: np.ndarray, dest: np.ndarray, gain: float):
+        """Converte campioni interi in float32 scalati, senza array intermedi"""
+        if self.unsigned:
+            np.subtract(chunk, np.float32(128.0), out=dest, casting='unsafe')
+            dest *= self.scale * np.float32(gain)
+        else:
+            np.multiply(chunk, self.scale * np.float32(gain), out=dest, casting='unsafe')
+
+
+class StreamingSource(PCMBuffer):
+    """Decodifica a blocchi in un thread dedicato verso un ring buffer letto dal callback audio
+    
+    Il ring è indicizzato per frame assoluto del file (slot = frame % capacità) e la finestra
+    dei frame decodificati viene pubblicata come singola tupla, per cui produttore e callback
+    non condividono alcun lock. Ogni uscita deve avere la propria istanza.
+    
+    In loop l'inizio della regione ripetuta resta decodificato in memoria (head): al punto di
+    loop il callback lo legge senza attese mentre il decoder riprende subito dopo di esso.
+    
+    Con sample_rate diverso da quello del file il decoder converte ogni blocco con
+    StreamResampler: frame, cursore e finestra sono sempre alla frequenza di uscita.
+    """
+    
+    def __init__(self, filepath: str, block_frames: int = 4096, prefetch_blocks: int = 8,
+                 sample_rate: Optional[int] = None):
+        try:
+            import soundfile as sf
+        except ImportError:
+            raise Exception("Per file MP3/OGG/FLAC installa: pip install soundfile")
+        
+        self.file = sf.SoundFile(filepath)
+        self.sample_rate = sample_rate or self.file.samplerate
+        self._channels = self.file.channels
+        self.resampler = None
+        self.drained = False  # Coda finale del resampler già emessa (fino al prossimo seek)
+        out_block = block_frames  # Frame massimi prodotti da un blocco decodificato
+        if self.sample_rate != self.file.samplerate:
+            self.resampler = StreamResampler(self.file.samplerate, self.sample_rate, self._channels)
+            out_block = self.resampler.max_output(block_frames)
+        self._frames = (self.resampler.output_frames(self.file.frames) if self.resampler
+                        else self.file.frames)
+        self.block_frames = out_block
+        self.capacity = out_block * max(2, prefetch_blocks)
+        self.ring = np.zeros((self.capacity, self._channels), dtype=np.float32)
+        self.block = np.zeros((block_frames, self._channels), dtype=np.float32)
+        self.cursor = 0  # Prossimo frame richiesto dal callback (scritto solo dal callback)
+        self.window = (0, 0)  # Frame decodificati [inizio, fine) (scritto solo dal decoder)
+        self.loop_region = None  # (inizio, fine) del loop, o None (scritto dal controllo)
+        self.head = None  # (primo frame, campioni) dell'inizio del loop (scritto solo dal decoder)
+        self.underruns = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.thread.start()
+        
+    @property
+    def data(self) -> Optional[np.ndarray]:
+        """Nessun array completo: i campioni arrivano dal decoder"""
+        return None
+        
+    @property
+    def frames(self) -> int:
+        return self._frames
+    
+    @property
+    def channels(self) -> int:
+        return self._channels
+    
+    @property
+    def nbytes(self) -> int:
+        head = self.head
+        return self.ring.nbytes + self.block.nbytes + (head[1].nbytes if head is not None else 0)
+    
+    def _decode_loop(self):
+        """Thread decoder: riempie il ring davanti al cursore, riposizionandosi se serve"""
+        idle_sleep = self.block_frames / self.sample_rate / 4
+        while self.running:
+            cursor = self.cursor
+            start, end = self.window
+            limit = self.frames
+            
+            region = self.loop_region
+            if region is None:
+                self.head = None
+            else:
+                loop_start, loop_end = region
+                head = self.head
+                if head is None or head[0] != loop_start:
+                    head = self._decode_head(loop_start, loop_end, end)
+                # I frame all'inizio del loop sono già in memoria: il ring serve da dopo
+                head_end = head[0] + len(head[1])
+                if head[0] <= cursor < head_end:
+                    cursor = head_end
+                if cursor <= loop_end:
+                    limit = loop_end  # Oltre la fine del loop il callback non leggerà
+            
+            # Il callback chiede frame fuori dalla finestra: riposiziona il decoder
+            if not start <= cursor <= end:
+                self._seek(cursor)
+                start = end = cursor
+                self.window = (start, end)
+            
+            # Ring pieno o fine (del file o del loop): attendi che il callback consumi
+            if end >= limit or end + self.block_frames - cursor > self.capacity:
+                time.sleep(idle_sleep)
+                continue
+            
+            block = self._read_block()[:max(0, self.frames - end)]
+            n = len(block)
+            if n == 0:
+                time.sleep(idle_sleep)
+                continue
+            
+            # Copia nel ring con eventuale giro attorno alla fine
+            slot = end % self.capacity
+            first = min(n, self.capacity - slot)
+            self.ring[slot:slot + first] = block[:first]
+            if first < n:
+                self.ring[:n - first] = block[first:n]
+            
+            end += n
+            self.window = (max(start, end - self.capacity), end)
+        
+        self.file.close()
+    
+    def _seek(self, frame: int):
+        """Riposiziona il decoder sul frame indicato (alla frequenza di uscita)"""
+        if self.resampler is None:
+            self.file.seek(frame)
+            return
+        self.file.seek(self.resampler.reset(frame))
+        self.drained = False
+    
+    def _read_block(self) -> np.ndarray:
+        """Decodifica il blocco successivo, convertito alla frequenza di uscita (vuoto a fine file)"""
+        n = self.file.read(self.block.shape[0], dtype='float32', always_2d=True, out=self.block).shape[0]
+        if self.resampler is None:
+            return self.block[:n]
+        if n > 0:
+            return self.resampler.process(self.block[:n])
+        if self.drained:
+            return self.block[:0]
+        self.drained = True
+        return self.resampler.flush()
+    
+    def _decode_head(self, loop_start: int, loop_end: int, resume: int) -> tuple:
+        """Decodifica e pubblica l'inizio del loop, poi riporta il decoder al frame resume"""
+        frames = max(0, min(self.capacity, loop_end - loop_start))
+        self._seek(loop_start)
+        blocks, count = [], 0
+        while count < frames:
+            block = self._read_block()
+            if len(block) == 0:
+                break
+            blocks.append(block.copy())
+            count += len(block)
+        data = np.concatenate(blocks)[:frames] if blocks else np.zeros((0, self._channels), dtype=np.float32)
+        self._seek(resume)
+        self.head = (loop_start, data)
+        return self.head
+    
+    def read_into(self, out: np.ndarray, start: int, frames: int, gain: float = 1.0) -> int:
+        frames = min(frames, self.frames - start)
+        window_start, window_end = self.window
+        if frames > 0 and not window_start <= start < window_end:
+            head = self.head
+            if head is not None and head[0] <= start < head[0] + len(head[1]):
+                # Inizio del loop, già in memoria
+                offset = start - head[0]
+                n = min(frames, len(head[1]) - offset)
+                np.multiply(head[1][offset:offset + n], gain, out=out[:n])
+                self.cursor = start + n
+                return n
+        if frames <= 0 or not window_start <= start < window_end:
+            # Dati non ancora decodificati (avvio o seek): silenzio, il decoder si riposiziona
+            self.cursor = start
+            if frames > 0:
+                self.underruns += 1
+            return 0
+        
+        n = min(frames, window_end - start)
+        slot = start % self.capacity
+        first = min(n, self.capacity - slot)
+        np.multiply(self.ring[slot:slot + first], gain, out=out[:first])
+        if first < n:
+            np.multiply(self.ring[:n - first], gain, out=out[first:n])
+        self.cursor = start + n
+        return n
+    
+    def iter_blocks(self, block_frames: int) -> Iterator[np.ndarray]:
+        """Decodifica con un decoder separato: il ring della riproduzione non viene toccato"""
+        import soundfile as sf
+        with sf.SoundFile(self.file.name) as f:
+            blocks = f.blocks(blocksize=block_frames, dtype='float32', always_2d=True)
+            if self.resampler is None:
+                yield from blocks
+                return
+            
+            # Blocchi convertiti di lunghezza variabile, ridivisi in blocchi da block_frames
+            resampler = StreamResampler(f.samplerate, self.sample_rate, self._channels)
+            pending = np.zeros((0, self._channels), dtype=np.float32)
+            remaining = self.frames
+            for block in blocks:
+                pending = np.concatenate((pending, resampler.process(block)))
+                while len(pending) >= block_frames and remaining > 0:
+                    yield pending[:min(block_frames, remaining)]
+                    remaining -= block_frames
+                    pending = pending[block_frames:]
+            pending = np.concatenate((pending, resampler.flush()))[:max(0, remaining)]
+            for start in range(0, len(pending), block_frames):
+                yield pending[start:start + block_frames]
+    
+    def prepare(self, start: int):
+        self.cursor = start
+    
+    def set_loop(self, loop: bool, start: int, end: int):
+        end = end if 0 < end < self.frames else self.frames
+        self.loop_region = (start, end) if loop and end > start else None
+        
+    def wait_ready(self, timeout: float = 0.5) -> bool:
+        """Attende che il decoder abbia riempito i primi blocchi dalla posizione richiesta"""
+        deadline = time.monotonic() + timeout
+        target = min(self.frames, self.cursor + self.block_frames * 2)
+        while time.monotonic() < deadline:
+            window_start, window_end = self.window
+            if window_start <= self.cursor and window_end >= target:
+                return True
+            time.sleep(0.002)
+        return False
+    
+    def release(self):
+        self.running = False
+
+
+def _find_wav_data_chunk(filepath: str) -> Tuple[int, int]:
+    """Ritorna (offset, dimensione) del chunk 'data' di un file RIFF/WAVE"""
+    with open(filepath, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise Exception("File WAV non valido")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise Exception("Chunk 'data' non trovato nel file WAV")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'data':
+                return f.tell(), chunk_size
+            # I chunk sono allineati a 2 byte
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+class VoiceState(NamedTuple):
+    """Parametri di una voce del mixer: immutabili, sostituiti in blocco dai metodi di controllo"""
+    buffer: Optional[PCMBuffer] = None
+    playing: bool = False
+    gain: float = 1.0  # Guadagno della singola voce (volume della traccia)
+    loop: bool = False
+    start: int = 0  # Posizione di inizio (samples) per trim
+    end: int = 0  # Posizione di fine (samples) per trim (0 = fine naturale)
+    seek: int = 0  # Posizione da cui il callback deve ripartire...
+    seek_id: int = 0  # ...quando questo contatore cambia
+    play_id: int = 0  # Incrementato a ogni play, per riconoscere la fine della riproduzione
+    started: int = 0  # Ordine di avvio tra tutte le voci dell'uscita (la più vecchia ha il minimo)
+    fade_in: int = 0  # Durata (samples) della dissolvenza in entrata dopo il play
+    crossfade_in: int = 0  # Entrata più lunga per questo solo play (crossfade, go), azzerata dal play
+    fade_out: int = 0  # Durata (samples) della dissolvenza in uscita prima della fine del trim
+    release: int = 0  # Durata (samples) della dissolvenza di rilascio (stop sfumato, crossfade)...
+    release_id: int = 0  # ...avviata quando questo contatore cambia
+    delay: int = 0  # Attesa (samples) tra il play, o la fine/partenza della voce seguita, e l'inizio
+    follow: int = -1  # Voce alla cui fine partire (-1 = parte subito dopo delay)...
+    follow_play_id: int = 0  # ...quando termina questo suo play...
+    follow_start: bool = False  # ...o, se True, quando questo suo play parte
+
+
+class AudioEvent(NamedTuple):
+    """Evento pubblicato dall'engine: 'position', 'start', 'end', 'play', 'pause', 'stop'"""
+    kind: str
+    output: str  # Nome dell'uscita (Main, Preview)
+    voice: int = -1  # Voce interessata (-1 = tutta l'uscita)
+    position: float = 0.0  # Posizione della voce in secondi
+    frame: int = 0  # Frame dello stream a cui è avvenuto (solo eventi del callback)
+
+
+class PlaybackState(NamedTuple):
+    """Stato di un'uscita: volume generale, pausa e stato di tutte le voci"""
+    voices: Tuple[VoiceState, ...] = ()
+    volume: float = 1.0  # Volume 0.0 - 1.0 (0% - 100%)
+    paused: bool = False
+
+
+class Voice:
+    """Stato di una voce posseduto dal callback audio (cursore, fine traccia, buffer di lavoro)"""
+    
+    __slots__ = ('cursor', 'position', 'applied_seek_id', 'ended_play_id', 'scratch',
+                 'play_id', 'played', 'applied_release_id', 'release_left', 'envelope',
+                 'wait_left', 'start_pending', 'end_frame', 'start_frame', 'started_play_id')
+    
+    def __init__(self):
+        self.cursor = 0
+        self.position = 0  # Copia pubblicata del cursore, letta da get_position
+        self.applied_seek_id = 0
+        self.ended_play_id = -1
+        self.scratch = np.zeros((0, 1), dtype=np.float32)  # Conversione canali sorgente -> stream
+        self.play_id = 0  # play_id a cui si riferiscono played e release_left
+        self.played = 0  # Frame suonati dall'ultimo play (per la dissolvenza in entrata)
+        self.applied_release_id = 0
+        self.release_left = -1  # Frame rimanenti del rilascio in corso (-1 = nessun rilascio)
+        self.envelope = np.zeros(0, dtype=np.float32)  # Inviluppo del blocco corrente
+        self.wait_left = 0  # Frame di attesa prima di iniziare (-1 = in attesa della voce seguita)
+        self.start_pending = False  # Partenza differita ancora da annunciare con un evento 'start'
+        self.end_frame = 0  # Frame dello stream a cui la voce è terminata
+        self.start_frame = 0  # Frame dello stream a cui la voce è partita...
+        self.started_play_id = -1  # ...per questo play
 
 
 class AudioOutput:
-    """Gestisce un singolo canale di output audio"""
+    """Gestisce un singolo canale di output audio, con un mixer a più voci
+    
+    Il callback audio non acquisisce mai lock: legge un'istantanea immutabile dello stato
+    (PlaybackState), sostituita atomicamente dai metodi di controllo, e pubblica posizione e
+    contatori tramite semplici assegnazioni di attributi. Il lock serializza solo i metodi di
+    controllo tra loro.
     
-    def __init__(self, device_id: Optional[int] = None, name: str = "Output"):
+    Le voci sono preallocate: ogni voce attiva viene scritta in una riga del buffer di mix e le
+    righe vengono sommate con un'unica operazione NumPy. I metodi "storici" (load_buffer, play,
+    set_trim, ...) agiscono sulla voce corrente, cioè l'ultimo cue caricato.
+    
+    Lo stream gira sempre a sample_rate: i buffer caricati devono avere la stessa frequenza.
+    """
+    
+    def __init__(self, device_id: Optional[int] = None, name: str = "Output", channels: int = 2,
+                 sample_rate: int = 44100, blocksize: int = 0, latency=None, max_voices: int = 8,
+                 events: Optional[deque] = None, position_rate: int = 30):
         self.device_id = device_id
         self.name = name
-        self.stream = None
-        self.is_playing = False
-        self.is_paused = False
-        self.current_position = 0
-        self.audio_data = None
-        self.sample_rate = 44100
-        self.volume = 1.0  # Volume 0.0 - 1.0 (0% - 100%)
-        self.loop_enabled = False  # Loop mode
-        self.start_position = 0  # Posizione di inizio (samples) per trim
-        self.end_position = 0  # Posizione di fine (samples) per trim (0 = fine naturale)
+        self.stream = None  # Stream sempre aperto: emette silenzio quando non c'è nulla da suonare
+        self.channels = channels  # Canali massimi dello stream (limitati da quelli del dispositivo)
+        self.blocksize = blocksize  # Frame per callback (0 = scelta di PortAudio)
+        self.latency = latency  # 'low', 'high', secondi o None (default del dispositivo)
+        self.stream_channels = 0
+        self.stream_rate = 0
+        self.sample_rate = sample_rate  # Frequenza fissa del dispositivo
         self.lock = threading.Lock()
+        self.voices = [Voice() for _ in range(max_voices)]
+        self.current_voice = 0  # Voce del cue caricato per ultimo
+        self.standby_voice = None  # Voce riservata al cue successivo, armato e pronto a partire
+        self.start_count = 0  # Avvii di voci finora (VoiceState.started)
+        self._state = PlaybackState(voices=(VoiceState(),) * max_voices)
+        self._mix = np.zeros((max_voices, 0, 1), dtype=np.float32)  # Una riga per voce attiva
+        self._ramp = np.zeros(0, dtype=np.float32)  # 0, 1, 2, ... precalcolata per gli inviluppi
+        self._envelope_tmp = np.zeros(0, dtype=np.float32)
+        
+        # Coda eventi verso la UI: append/popleft di deque sono thread-safe e non bloccanti
+        self.events = events if events is not None else deque(maxlen=1024)
+        self.position_rate = position_rate  # Eventi 'position' al secondo per la voce corrente
+        self._position_frames = 0
+        
+        # Scritti solo dal callback audio
+        self.stream_frame = 0  # Frame emessi dallo stream
+        self.xruns = 0  # Underflow segnalati da PortAudio
+        self.source_underruns = 0  # Blocchi senza dati pronti dal sorgente (streaming)
+        self.callback_count = 0
+        self.max_callback_time = 0.0
+        
+    def _update(self, **changes):
+        """Pubblica un nuovo stato dell'uscita (chiamare con il lock acquisito)"""
+        self._state = self._state._replace(**changes)
+        
+    def _update_voice(self, index: int, **changes):
+        """Pubblica un nuovo stato per una voce (chiamare con il lock acquisito)"""
+        voices = list(self._state.voices)
+        voices[index] = voice_state = voices[index]._replace(**changes)
+        self._state = self._state._replace(voices=tuple(voices))
+        if voice_state.buffer is not None and not changes.keys().isdisjoint(('buffer', 'loop', 'start', 'end')):
+            voice_state.buffer.set_loop(voice_state.loop, voice_state.start, voice_state.end)
+        
+    def _seek_changes(self, index: int, position: int) -> dict:
+        """Modifiche di stato per riposizionare una voce (chiamare con il lock acquisito)"""
+        self.voices[index].position = position
+        return {'seek': position, 'seek_id': self._state.voices[index].seek_id + 1}
+    
+    def _voice_active(self, index: int) -> bool:
+        """True se la voce è in riproduzione e non ha raggiunto la fine"""
+        voice_state = self._state.voices[index]
+        return voice_state.playing and self.voices[index].ended_play_id != voice_state.play_id
+    
+    def _next_start(self) -> int:
+        """Numero d'ordine per una voce che parte (chiamare con il lock acquisito)"""
+        self.start_count += 1
+        return self.start_count
+    
+    def _allocate_voice(self, exclude: Optional[int] = None) -> int:
+        """Trova una voce libera; se sono tutte occupate riusa quella partita prima (chiamare con il lock)"""
+        candidates = [i for i in range(len(self.voices))
+                      if i not in (self.current_voice, self.standby_voice, exclude)]
+        for index in candidates:
+            if not self._voice_active(index):
+                return index
+        return min(candidates, key=lambda i: self._state.voices[i].started)
+    
+    def _prepare_voice(self, index: int, buffer: PCMBuffer):
+        """Alloca il buffer di conversione canali della voce (mai nel callback)"""
+        voice = self.voices[index]
+        max_frames = max(8192, self.blocksize)
+        if buffer.channels != voice.scratch.shape[1] or len(voice.scratch) == 0:
+            voice.scratch = np.zeros((max_frames, buffer.channels), dtype=np.float32)
+        if len(voice.envelope) < max_frames:
+            voice.envelope = np.zeros(max_frames, dtype=np.float32)
+    
+    def _release_unused(self, buffer: Optional[PCMBuffer]):
+        """Rilascia un buffer non più referenziato da alcuna voce"""
+        if buffer is not None and all(v.buffer is not buffer for v in self._state.voices):
+            buffer.release()
+    
+    @property
+    def _current(self) -> VoiceState:
+        return self._state.voices[self.current_voice]
+    
+    @property
+    def buffer(self) -> Optional[PCMBuffer]:
+        return self._current.buffer
+    
+    @property
+    def volume(self) -> float:
+        return self._state.volume
+    
+    @property
+    def loop_enabled(self) -> bool:
+        return self._current.loop
+    
+    @property
+    def start_position(self) -> int:
+        return self._current.start
+    
+    @property
+    def end_position(self) -> int:
+        return self._current.end
+    
+    @property
+    def current_position(self) -> int:
+        return self.voices[self.current_voice].position
+    
+    @property
+    def is_paused(self) -> bool:
+        return self._state.paused
+    
+    @property
+    def is_playing(self) -> bool:
+        """True se almeno una voce è in riproduzione (anche in pausa)"""
+        return any(self._voice_active(i) for i in range(len(self.voices)))
+    
+    @property
+    def is_current_playing(self) -> bool:
+        """True dal play della voce corrente fino a stop o alla sua fine naturale"""
+        return self._voice_active(self.current_voice)
+        
+    @property
+    def audio_data(self) -> Optional[np.ndarray]:
+        """Campioni float32 della traccia caricata (vista in sola lettura)"""
+        buffer = self.buffer
+        return buffer.data if buffer is not None else None
         
     def load_audio(self, audio_data: np.ndarray, sample_rate: int):
-        """Carica un array audio in memoria"""
+        """Carica un array audio in memoria, convertendolo alla frequenza dell'uscita"""
+        if sample_rate != self.sample_rate:
+            audio_data = resample(_to_float32(audio_data), sample_rate, self.sample_rate)
+        self.load_buffer(PCMBuffer(audio_data, self.sample_rate))
+    
+    def load_buffer(self, buffer: PCMBuffer, layer: bool = False):
+        """Collega un buffer PCM condiviso alla voce corrente
+        
+        Con layer=True, se la voce corrente sta suonando il buffer va su una nuova voce, che
+        diventa la corrente, e la precedente continua a suonare sotto. Senza layer una voce
+        corrente in riproduzione continua a suonare, dall'inizio del nuovo buffer.
+        """
         with self.lock:
-            # Normalizza a float32 se necessario
-            if audio_data.dtype == np.int16:
-                self.audio_data = audio_data.astype(np.float32) / 32768.0
-            elif audio_data.dtype == np.int32:
-                self.audio_data = audio_data.astype(np.float32) / 2147483648.0
-            else:
-                self.audio_data = audio_data.astype(np.float32)
-                
-            self.sample_rate = sample_rate
-            self.current_position = 0
+            if layer and self._voice_active(self.current_voice):
+                self.current_voice = self._allocate_voice()
+            index = self.current_voice
+            voice_state = self._state.voices[index]
+            old_buffer = voice_state.buffer
+            playing = self._voice_active(index)
+            buffer.prepare(0)
+            self._prepare_voice(index, buffer)
+            changes = {}
+            if playing:
+                # Nuovo play sulla stessa voce: fine e dissolvenze contano dal nuovo buffer
+                changes = {'play_id': voice_state.play_id + 1, 'started': self._next_start()}
+            self._update_voice(index, buffer=buffer, playing=playing, gain=1.0, start=0, end=0,
+                               fade_in=0, crossfade_in=0, fade_out=0, delay=0, follow=-1,
+                               **changes, **self._seek_changes(index, 0))
+            if playing:
+                self.events.append(AudioEvent('play', self.name, index, 0.0))
+            if old_buffer is not buffer:
+                self._release_unused(old_buffer)
+    
+    def fire(self, buffer: PCMBuffer, gain: float = 1.0, start_seconds: float = 0.0,
+             end_seconds: float = 0.0, loop: bool = False, fade_in: float = 0.0,
+             fade_out: float = 0.0, delay: float = 0.0, follow: Optional[int] = None,
+             follow_start: bool = False) -> int:
+        """Avvia un buffer su una voce libera senza toccare la voce corrente; ritorna l'indice
+        
+        delay (secondi) ritarda la partenza; con follow la voce parte delay secondi dopo la
+        fine (o, con follow_start, la partenza) della voce indicata, con precisione al campione.
+        Se la voce seguita non è in riproduzione conta il suo prossimo play.
+        """
+        start = int(start_seconds * buffer.sample_rate)
+        end = int(end_seconds * buffer.sample_rate) if end_seconds > 0 else 0
+        buffer.prepare(start)
+        buffer.wait_ready()
+        with self.lock:
+            if not self._ensure_stream(self.sample_rate):
+                self._release_unused(buffer)  # Nessuna voce lo leggerà (es. decoder in streaming)
+                return -1
+            index = self._allocate_voice(exclude=follow)
+            old_buffer = self._state.voices[index].buffer
+            self._prepare_voice(index, buffer)
+            follow_play_id = 0
+            if follow is not None:
+                follow_play_id = self._state.voices[follow].play_id
+                if not self._voice_active(follow):
+                    follow_play_id += 1  # Cue caricato o finito: conta dal prossimo play
+            self._update_voice(index, buffer=buffer, playing=True, gain=max(0.0, gain), loop=loop,
+                               start=start, end=end, play_id=self._state.voices[index].play_id + 1,
+                               started=self._next_start(),
+                               fade_in=int(fade_in * buffer.sample_rate), crossfade_in=0,
+                               fade_out=int(fade_out * buffer.sample_rate),
+                               delay=max(0, int(delay * self.sample_rate)),
+                               follow=follow if follow is not None else -1,
+                               follow_play_id=follow_play_id, follow_start=follow_start,
+                               **self._seek_changes(index, start))
+            self.events.append(AudioEvent('play', self.name, index, start / self.sample_rate))
+            if old_buffer is not buffer:
+                self._release_unused(old_buffer)
+            return index
     
     def set_volume(self, volume: float):
-        """Imposta il volume (0.0 - 1.0)"""
+        """Imposta il volume generale dell'uscita (0.0 - 1.0)"""
         with self.lock:
-            self.volume = max(0.0, min(1.0, volume))
+            self._update(volume=max(0.0, min(1.0, volume)))
+    
+    def set_voice_gain(self, gain: float, voice: Optional[int] = None):
+        """Imposta il guadagno di una voce (default: la corrente)"""
+        with self.lock:
+            index = self.current_voice if voice is None else voice
+            self._update_voice(index, gain=max(0.0, gain))
     
     def set_loop(self, loop: bool):
         """Imposta la modalità loop"""
         with self.lock:
-            self.loop_enabled = loop
+            self._update_voice(self.current_voice, loop=loop)
+    
+    def set_fades(self, fade_in: float, fade_out: float):
+        """Imposta le dissolvenze (secondi) in entrata e prima della fine del trim della voce corrente"""
+        with self.lock:
+            self._update_voice(self.current_voice, fade_in=max(0, int(fade_in * self.sample_rate)),
+                               fade_out=max(0, int(fade_out * self.sample_rate)))
+    
+    def crossfade(self, seconds: float) -> bool:
+        """Avvia la voce corrente sfumando in uscita tutte le altre, nello stesso ciclo di callback"""
+        buffer = self.buffer
+        if buffer is not None:
+            buffer.wait_ready()
+            
+        with self.lock:
+            voice_state = self._current
+            if voice_state.buffer is None or not self._ensure_stream(self.sample_rate):
+                return False
+            
+            length = max(1, int(seconds * self.sample_rate))
+            voices = list(self._state.voices)
+            for index in range(len(voices)):
+                if index != self.current_voice and self._voice_active(index):
+                    voices[index] = voices[index]._replace(release=length,
+                                                           release_id=voices[index].release_id + 1)
+            voices[self.current_voice] = voice_state._replace(
+                playing=True, play_id=voice_state.play_id + 1, started=self._next_start(),
+                delay=0, follow=-1, crossfade_in=length)
+            # Un'unica pubblicazione: uscita ed entrata partono nello stesso blocco
+            self._state = self._state._replace(voices=tuple(voices), paused=False)
+            self.events.append(AudioEvent('play', self.name, self.current_voice,
+                                          voice_state.start / self.sample_rate))
+            return True
     
     def set_trim(self, start_seconds: float, end_seconds: float):
         """Imposta i punti di inizio e fine per il trim"""
         with self.lock:
-            if self.audio_data is None:
+            index = self.current_voice
+            buffer = self._state.voices[index].buffer
+            if buffer is None:
                 return
             
             # Converte secondi in sample
-            self.start_position = int(start_seconds * self.sample_rate)
-            if end_seconds > 0:
-                self.end_position = int(end_seconds * self.sample_rate)
-            else:
-                self.end_position = 0  # 0 = fino alla fine
+            start = int(start_seconds * self.sample_rate)
+            end = int(end_seconds * self.sample_rate) if end_seconds > 0 else 0  # 0 = fino alla fine
             
-            # Assicura che start_position sia nella traccia
-            if self.start_position >= len(self.audio_data):
-                self.start_position = 0
+            # Assicura che start sia nella traccia
+            if start >= buffer.frames:
+                start = 0
             
-            # Posiziona all'inizio del trim
-            self.current_position = self.start_position
+            # Posiziona all'inizio del trim (i sorgenti in streaming riposizionano il decoder)
+            buffer.prepare(start)
+            self._update_voice(index, start=start, end=end, **self._seek_changes(index, start))
             
     def play(self):
-        """Avvia la riproduzione"""
+        """Avvia la riproduzione della voce corrente (o riprende dalla pausa)
+        
+        Dalla pausa riprendono tutte le voci; se nel frattempo è stato caricato un nuovo cue
+        (es. hotkey in pausa) anche la voce corrente parte.
+        """
+        # Per i sorgenti in streaming attende i primi blocchi decodificati (fuori dal lock)
+        buffer = self.buffer
+        if buffer is not None and not self.is_current_playing:
+            buffer.wait_ready()
+            
         with self.lock:
-            if self.audio_data is None:
-                return False
+            if self._state.paused:
+                self._update(paused=False)
+                if self._voice_active(self.current_voice) or self._current.buffer is None:
+                    self.events.append(AudioEvent('play', self.name))
+                    return True
                 
-            if self.is_paused:
-                self.is_paused = False
-                return True
+            voice_state = self._current
+            if voice_state.buffer is None:
+                return False
                 
-            self.is_playing = True
-            self._start_stream()
+            # Lo stream è già aperto: basta pubblicare il nuovo stato (latenza = un blocco)
+            if not self._ensure_stream(self.sample_rate):
+                return False
+            self._update_voice(self.current_voice, playing=True, play_id=voice_state.play_id + 1,
+                               started=self._next_start(), crossfade_in=0, delay=0, follow=-1)
+            self.events.append(AudioEvent('play', self.name, self.current_voice,
+                                          voice_state.start / self.sample_rate))
             return True
             
     def pause(self):
-        """Mette in pausa la riproduzione"""
+        """Mette in pausa tutte le voci dell'uscita"""
+        with self.lock:
+            self._update(paused=True)
+            self.events.append(AudioEvent('pause', self.name))
+            
+    def stop(self, fade_seconds: float = 0.0):
+        """Ferma tutte le voci (con fade_seconds > 0 le sfuma prima di fermarle)"""
+        with self.lock:
+            if fade_seconds > 0 and not self._state.paused:
+                length = max(1, int(fade_seconds * self.sample_rate))
+                for index in range(len(self.voices)):
+                    if self._voice_active(index):
+                        self._update_voice(index, release=length,
+                                           release_id=self._state.voices[index].release_id + 1)
+                return
+            for index in range(len(self.voices)):
+                self._stop_voice(index)
+            self._update(paused=False)
+            self.events.append(AudioEvent('stop', self.name))
+    
+    def stop_voice(self, voice: int):
+        """Ferma una singola voce"""
+        with self.lock:
+            self._stop_voice(voice)
+            
+    def _stop_voice(self, index: int):
+        """Ferma una voce riportandola all'inizio del trim (chiamare con il lock acquisito)
+        
+        Le voci in attesa della sua fine vengono fermate anch'esse.
+        """
+        voice_state = self._state.voices[index]
+        if voice_state.buffer is not None:
+            voice_state.buffer.prepare(voice_state.start)
+        self._update_voice(index, playing=False, **self._seek_changes(index, voice_state.start))
+        for follower, follower_state in enumerate(self._state.voices):
+            if follower_state.follow == index and follower_state.playing:
+                self._stop_voice(follower)
+    
+    def arm(self, buffer: PCMBuffer, gain: float = 1.0, start_seconds: float = 0.0,
+            end_seconds: float = 0.0, loop: bool = False, fade_in: float = 0.0,
+            fade_out: float = 0.0) -> int:
+        """Prepara un buffer, già posizionato sul trim, su una voce riservata; ritorna l'indice
+        
+        La voce resta ferma finché go() non la avvia. Un nuovo arm sostituisce il precedente;
+        lo stream viene aperto subito, così il go non attende il dispositivo.
+        """
+        start = int(start_seconds * buffer.sample_rate)
+        end = int(end_seconds * buffer.sample_rate) if end_seconds > 0 else 0
+        buffer.prepare(start)  # I sorgenti in streaming iniziano a decodificare da qui
+        with self.lock:
+            self._disarm()
+            if not self._ensure_stream(self.sample_rate):
+                self._release_unused(buffer)
+                return -1
+            index = self._allocate_voice()
+            old_buffer = self._state.voices[index].buffer
+            self._prepare_voice(index, buffer)
+            self._update_voice(index, buffer=buffer, playing=False, gain=max(0.0, gain), loop=loop,
+                               start=start, end=end, fade_in=int(fade_in * buffer.sample_rate),
+                               crossfade_in=0, fade_out=int(fade_out * buffer.sample_rate),
+                               delay=0, follow=-1,
+                               **self._seek_changes(index, start))
+            self.standby_voice = index
+            if old_buffer is not buffer:
+                self._release_unused(old_buffer)
+            return index
+    
+    def disarm(self):
+        """Libera la voce riservata al cue successivo"""
+        with self.lock:
+            self._disarm()
+    
+    def _disarm(self):
+        """Libera la voce riservata (chiamare con il lock acquisito)"""
+        index = self.standby_voice
+        if index is None:
+            return
+        self.standby_voice = None
+        buffer = self._state.voices[index].buffer
+        self._update_voice(index, buffer=None, playing=False)
+        self._release_unused(buffer)
+    
+    def go(self, voice: int, fade_seconds: float = 0.0) -> bool:
+        """Avvia una voce armata (o in attesa) fermando le altre nello stesso ciclo di callback
+        
+        Con fade_seconds > 0 le altre voci sfumano in uscita mentre la nuova sfuma in entrata.
+        """
+        buffer = self._state.voices[voice].buffer
+        if buffer is None:
+            return False
+        buffer.wait_ready()
+        
+        with self.lock:
+            voice_state = self._state.voices[voice]
+            if voice_state.buffer is None or not self._ensure_stream(self.sample_rate):
+                return False
+            
+            length = max(1, int(fade_seconds * self.sample_rate)) if fade_seconds > 0 else 0
+            voices = list(self._state.voices)
+            for index, other in enumerate(voices):
+                if index == voice or not self._voice_active(index):
+                    continue
+                if length:
+                    voices[index] = other._replace(release=length, release_id=other.release_id + 1)
+                else:
+                    if other.buffer is not None:
+                        other.buffer.prepare(other.start)
+                    voices[index] = other._replace(playing=False, **self._seek_changes(index, other.start))
+            
+            if self._voice_active(voice):
+                # Voce in attesa (avvio automatico): parte adesso dall'inizio del trim
+                voice_state = voice_state._replace(**self._seek_changes(voice, voice_state.start))
+            voices[voice] = voice_state._replace(
+                playing=True, play_id=voice_state.play_id + 1, started=self._next_start(),
+                delay=0, follow=-1, crossfade_in=length)
+            
+            # Un'unica pubblicazione: stop delle altre voci e partenza nello stesso blocco
+            self._state = self._state._replace(voices=tuple(voices), paused=False)
+            self.current_voice = voice
+            if self.standby_voice == voice:
+                self.standby_voice = None
+            self.events.append(AudioEvent('play', self.name, voice, voice_state.start / self.sample_rate))
+            return True
+    
+    def is_voice_active(self, voice: int) -> bool:
+        """True se la voce suona o è in attesa di partire"""
+        return self._voice_active(voice)
+    
+    def set_current_voice(self, voice: int):
+        """Rende corrente una voce avviata con fire (es. il cue successivo partito in automatico)"""
+        with self.lock:
+            self.current_voice = voice
+    
+    def set_device(self, device_id: Optional[int]):
+        """Cambia dispositivo, riaprendo lo stream persistente"""
         with self.lock:
-            self.is_paused = True
+            self.device_id = device_id
+            self._close_stream()
+            self._ensure_stream(self.sample_rate)
             
-    def stop(self):
-        """Ferma la riproduzione"""
+    def set_stream_settings(self, blocksize: Optional[int] = None, latency=None):
+        """Imposta blocksize e latenza richieste, riaprendo lo stream se già aperto"""
+        with self.lock:
+            if blocksize is not None:
+                self.blocksize = max(0, int(blocksize))
+            if latency is not None:
+                self.latency = latency
+            if self.stream is not None:
+                self._close_stream()
+                self._ensure_stream(self.sample_rate)
+    
+    def set_sample_rate(self, sample_rate: int):
+        """Cambia la frequenza fissa dello stream; le voci vengono fermate e scollegate"""
         with self.lock:
-            self.is_playing = False
-            self.is_paused = False
-            self.current_position = 0
-            if self.stream:
+            if sample_rate == self.sample_rate:
+                return
+            buffers = {id(v.buffer): v.buffer for v in self._state.voices if v.buffer is not None}
+            for index in range(len(self.voices)):
+                self._update_voice(index, buffer=None, playing=False)
+            self._update(paused=False)
+            for buffer in buffers.values():
+                buffer.release()
+            self.sample_rate = sample_rate
+            if self.stream is not None:
+                self._ensure_stream(sample_rate)
+    
+    def get_latency_info(self) -> dict:
+        """Parametri richiesti e negoziati con PortAudio per lo stream corrente"""
+        stream = self.stream
+        info = {
+            'device': self.device_id,
+            'requested_blocksize': self.blocksize,
+            'requested_latency': self.latency,
+            'open': stream is not None
+        }
+        if stream is not None:
+            info.update({
+                'sample_rate': stream.samplerate,
+                'blocksize': stream.blocksize,
+                'channels': self.stream_channels,
+                'latency': stream.latency,  # Latenza effettiva di uscita in secondi
+                'block_ms': 1000.0 * stream.blocksize / stream.samplerate if stream.blocksize else None
+            })
+        return info
+            
+    def open(self):
+        """Apre lo stream persistente in anticipo, così il primo play è immediato"""
+        with self.lock:
+            self._ensure_stream(self.sample_rate)
+    
+    def close(self):
+        """Chiude lo stream persistente (uscita dall'applicazione)"""
+        with self.lock:
+            for index in range(len(self.voices)):
+                self._stop_voice(index)
+            self._close_stream()
+            
+    def _close_stream(self):
+        """Ferma e chiude lo stream (chiamare con il lock acquisito)"""
+        if self.stream:
+            try:
                 self.stream.stop()
                 self.stream.close()
-                self.stream = None
-                
-    def _start_stream(self):
-        """Avvia lo stream audio"""
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
+            except Exception as e:
+                print(f"Errore chiusura stream {self.name}: {e}")
+            self.stream = None
             
-        def callback(outdata, frames, time_info, status):
-            with self.lock:
-                if not self.is_playing or self.is_paused:
-                    outdata.fill(0)
-                    return
-                    
-                if self.audio_data is None:
-                    outdata.fill(0)
-                    return
-                
-                # Determina la posizione di fine effettiva
-                actual_end = self.end_position if self.end_position > 0 else len(self.audio_data)
-                
-                # Controlla se abbiamo raggiunto la fine del trim
-                remaining = actual_end - self.current_position
-                if remaining <= 0:
-                    # Gestione loop
-                    if self.loop_enabled:
-                        self.current_position = self.start_position
-                        remaining = actual_end - self.start_position
-                    else:
-                        outdata.fill(0)
-                        self.is_playing = False
-                        return
-                    
-                chunk_size = min(frames, remaining)
-                chunk = self.audio_data[self.current_position:self.current_position + chunk_size]
-                # Applica il volume
-                outdata[:chunk_size] = chunk * self.volume
+    def _ensure_stream(self, sample_rate: int) -> bool:
+        """Apre lo stream se assente o a una frequenza diversa (chiamare con il lock acquisito)"""
+        if self.stream is not None and self.stream_rate == sample_rate:
+            return True
+        self._close_stream()
+        return self._start_stream(sample_rate)
                 
-                if chunk_size < frames:
-                    outdata[chunk_size:].fill(0)
-                    
-                self.current_position += chunk_size
+    def _start_stream(self, sample_rate: int) -> bool:
+        """Apre lo stream audio, che resta attivo fino a close() o al cambio dispositivo"""
+        def callback(outdata, frames, time_info, status):
+            started = time.perf_counter()
+            self.callback_count += 1
+            if status.output_underflow:
+                self.xruns += 1
+            
+            self._render(outdata, frames)
+            
+            elapsed = time.perf_counter() - started
+            if elapsed > self.max_callback_time:
+                self.max_callback_time = elapsed
                 
         try:
-            channels = self.audio_data.shape[1] if len(self.audio_data.shape) > 1 else 1
+            device_info = sd.query_devices(self.device_id, 'output')
+            channels = max(1, min(self.channels, int(device_info['max_output_channels'])))
             self.stream = sd.OutputStream(
                 device=self.device_id,
                 channels=channels,
                 callback=callback,
-                samplerate=self.sample_rate
+                samplerate=sample_rate,
+                blocksize=self.blocksize,
+                latency=self.latency
             )
+            self.stream_channels = channels
+            self.stream_rate = sample_rate
+            # Buffer di mix e rampa degli inviluppi preallocati
+            max_frames = max(8192, self.blocksize)
+            self._mix = np.zeros((len(self.voices), max_frames, channels), dtype=np.float32)
+            self._ramp = np.arange(max_frames, dtype=np.float32)
+            self._envelope_tmp = np.zeros(max_frames, dtype=np.float32)
             self.stream.start()
+            return True
         except Exception as e:
             print(f"Errore avvio stream {self.name}: {e}")
-            self.is_playing = False
+            self.stream = None
+            return False
+            
+    def _render(self, outdata: np.ndarray, frames: int):
+        """Somma in outdata tutte le voci attive (thread audio, senza lock)"""
+        state = self._state  # Un'unica lettura: lo stato non cambia durante il blocco
+        mix = self._mix
+        if mix.shape[1] < frames or mix.shape[2] != outdata.shape[1]:
+            # Succede solo se PortAudio chiede blocchi più grandi del previsto
+            mix = self._mix = np.zeros((len(self.voices), frames, outdata.shape[1]), dtype=np.float32)
+            self._ramp = np.arange(frames, dtype=np.float32)
+            self._envelope_tmp = np.zeros(frames, dtype=np.float32)
+        
+        block_start = self.stream_frame
+        self.stream_frame += frames
+        
+        active = 0
+        # Le voci che seguono un'altra vengono elaborate dopo: possono partire nello stesso
+        # blocco in cui termina la voce seguita, al frame esatto
+        for followers in (False, True):
+            for index, voice_state in enumerate(state.voices):
+                if (voice_state.follow >= 0) != followers:
+                    continue
+                voice = self.voices[index]
+                
+                # Riposizionamento richiesto da set_trim/stop/load
+                if voice_state.seek_id != voice.applied_seek_id:
+                    voice.applied_seek_id = voice_state.seek_id
+                    voice.cursor = voice_state.seek
+                
+                if (state.paused or not voice_state.playing or voice_state.buffer is None
+                        or voice.ended_play_id == voice_state.play_id):
+                    continue
+                
+                # Nuovo play: azzera i contatori delle dissolvenze e dell'attesa
+                if voice.play_id != voice_state.play_id:
+                    voice.play_id = voice_state.play_id
+                    voice.played = 0
+                    voice.release_left = -1
+                    voice.applied_release_id = voice_state.release_id
+                    voice.wait_left = voice_state.delay if voice_state.follow < 0 else -1
+                    voice.start_pending = voice_state.delay > 0 or voice_state.follow >= 0
+                
+                # Rilascio richiesto da stop sfumato o crossfade
+                if voice_state.release_id != voice.applied_release_id:
+                    voice.applied_release_id = voice_state.release_id
+                    voice.release_left = voice_state.release
+                
+                # Partenza alla fine, o alla partenza, della voce seguita (+ delay), al frame esatto
+                if voice.wait_left < 0:
+                    leader = self.voices[voice_state.follow]
+                    if voice_state.follow_start:
+                        if leader.started_play_id != voice_state.follow_play_id:
+                            continue
+                        wait = leader.start_frame + voice_state.delay - block_start
+                        if wait < 0:
+                            # Armata dopo la partenza prevista: resta allineata saltando i frame persi
+                            voice.cursor += -wait
+                    else:
+                        if leader.ended_play_id != voice_state.follow_play_id:
+                            continue
+                        wait = leader.end_frame + voice_state.delay - block_start
+                    voice.wait_left = max(0, wait)
+                
+                # Attesa (pre-wait) prima della partenza
+                offset = 0
+                if voice.wait_left > 0:
+                    if voice.wait_left >= frames:
+                        voice.wait_left -= frames
+                        continue
+                    offset = voice.wait_left
+                    voice.wait_left = 0
+                if voice.started_play_id != voice.play_id:
+                    voice.started_play_id = voice.play_id
+                    voice.start_frame = block_start + offset
+                if voice.start_pending:
+                    voice.start_pending = False
+                    self.events.append(AudioEvent('start', self.name, index,
+                                                  voice.cursor / self.sample_rate, block_start + offset))
+                
+                target = mix[active, :frames]
+                if offset:
+                    target[:offset].fill(0)
+                written = self._render_voice(voice, voice_state, target[offset:], frames - offset)
+                if written > 0:
+                    active += 1
+                
+                if voice.ended_play_id == voice_state.play_id:
+                    voice.end_frame = block_start + offset + written
+                    self.events.append(AudioEvent('end', self.name, index,
+                                                  voice.position / self.sample_rate, voice.end_frame))
+                elif index == self.current_voice:
+                    # Posizione della voce corrente, limitata a position_rate eventi al secondo
+                    self._position_frames += frames
+                    if self._position_frames * self.position_rate >= self.sample_rate:
+                        self._position_frames = 0
+                        self.events.append(AudioEvent('position', self.name, index,
+                                                      voice.position / self.sample_rate, block_start))
+        
+        if active == 0:
+            outdata.fill(0)
+            return
+        
+        # Somma vettoriale delle voci e volume generale
+        np.sum(mix[:active, :frames], axis=0, out=outdata)
+        if state.volume != 1.0:
+            outdata *= state.volume
+            
+    def _render_voice(self, voice: Voice, voice_state: VoiceState, target: np.ndarray, frames: int) -> int:
+        """Scrive una voce in target (già moltiplicata per il suo guadagno); ritorna i frame scritti"""
+        buffer = voice_state.buffer
+        
+        # Determina la posizione di fine effettiva
+        actual_end = buffer.frames
+        if 0 < voice_state.end < actual_end:
+            actual_end = voice_state.end
+        
+        written = 0
+        while written < frames:
+            # Rilascio completato: la voce è finita
+            if voice.release_left == 0:
+                voice.ended_play_id = voice_state.play_id
+                break
+            
+            # Controlla se abbiamo raggiunto la fine del trim
+            remaining = actual_end - voice.cursor
+            if remaining <= 0:
+                # Gestione loop: riparte dall'inizio del trim nello stesso blocco
+                if voice_state.loop and actual_end > voice_state.start:
+                    voice.cursor = voice_state.start
+                    continue
+                voice.ended_play_id = voice_state.play_id
+                break
+            
+            # Copia (e converte, per i buffer mappati) solo i frame richiesti, applicando il guadagno
+            wanted = min(frames - written, remaining)
+            if voice.release_left > 0:
+                wanted = min(wanted, voice.release_left)
+            n = self._read_source(buffer, voice, target[written:], wanted, voice_state.gain)
+            if n == 0:
+                self.source_underruns += 1
+                break
+            
+            envelope = self._envelope(voice, voice_state, n, actual_end)
+            if envelope is not None:
+                target[written:written + n] *= envelope[:, np.newaxis]
+            
+            voice.cursor += n
+            voice.played += n
+            if voice.release_left > 0:
+                voice.release_left -= n
+            written += n
+        
+        if written < frames:
+            target[written:].fill(0)
+        voice.position = voice.cursor
+        return written
+            
+    def _envelope(self, voice: Voice, voice_state: VoiceState, n: int, actual_end: int) -> Optional[np.ndarray]:
+        """Inviluppo delle dissolvenze per i prossimi n frame della voce; None se unitario
+        
+        Calcolato in modo vettoriale nel buffer preallocato della voce a partire dalla rampa
+        precalcolata 0, 1, 2, ...: nessuna allocazione nel callback.
+        """
+        if len(voice.envelope) < n:
+            # Succede solo se PortAudio chiede blocchi più grandi del previsto
+            voice.envelope = np.zeros(n, dtype=np.float32)
+        ramp = self._ramp[:n]
+        envelope = voice.envelope[:n]
+        tmp = self._envelope_tmp[:n]
+        active = False
+        
+        # Dissolvenza in entrata: (played + i) / fade_in (o la rampa del crossfade, se più lunga)
+        fade_in = max(voice_state.fade_in, voice_state.crossfade_in)
+        if fade_in > 0 and voice.played < fade_in:
+            np.add(ramp, voice.played, out=envelope)
+            envelope *= 1.0 / fade_in
+            active = True
+        
+        # Dissolvenza in uscita prima della fine del trim: (fine - cursore - i) / fade_out
+        if (voice_state.fade_out > 0 and not voice_state.loop
+                and actual_end - voice.cursor - n < voice_state.fade_out):
+            np.subtract(actual_end - voice.cursor, ramp, out=tmp)
+            tmp *= 1.0 / voice_state.fade_out
+            if active:
+                np.minimum(envelope, tmp, out=envelope)
+            else:
+                envelope[:] = tmp
+                active = True
+        
+        # Rilascio: (release_left - i) / release
+        if voice.release_left > 0:
+            np.subtract(voice.release_left, ramp, out=tmp)
+            tmp *= 1.0 / voice_state.release
+            if active:
+                np.multiply(envelope, tmp, out=envelope)
+            else:
+                envelope[:] = tmp
+                active = True
+        
+        if not active:
+            return None
+        np.clip(envelope, 0.0, 1.0, out=envelope)
+        return envelope
+            
+    def _read_source(self, buffer: PCMBuffer, voice: Voice, outdata: np.ndarray, frames: int,
+                     gain: float) -> int:
+        """Legge dal cursore della voce adattando i canali del sorgente a quelli dello stream"""
+        out_channels = outdata.shape[1]
+        if buffer.channels == out_channels:
+            return buffer.read_into(outdata, voice.cursor, frames, gain)
+        
+        scratch = voice.scratch
+        if scratch.shape[1] != buffer.channels or scratch.shape[0] < frames:
+            # Succede solo se PortAudio chiede blocchi più grandi del previsto
+            scratch = voice.scratch = np.zeros((frames, buffer.channels), dtype=np.float32)
+        
+        n = buffer.read_into(scratch, voice.cursor, frames, gain)
+        if buffer.channels == 1:
+            # Mono: stesso segnale su tutti i canali
+            outdata[:n] = scratch[:n]
+        elif out_channels == 1:
+            # Uscita mono: media dei canali
+            np.mean(scratch[:n], axis=1, out=outdata[:n, 0])
+        else:
+            # Canali in eccesso scartati, quelli mancanti lasciati in silenzio
+            common = min(out_channels, buffer.channels)
+            outdata[:n, :common] = scratch[:n, :common]
+            outdata[:n, common:] = 0
+        return n
             
     def get_position(self) -> float:
-        """Ritorna la posizione corrente in secondi"""
-        with self.lock:
-            if self.audio_data is None:
-                return 0.0
-            return self.current_position / self.sample_rate
+        """Ritorna la posizione corrente della voce corrente in secondi"""
+        buffer = self.buffer
+        if buffer is None:
+            return 0.0
+        return self.current_position / buffer.sample_rate
             
     def get_duration(self) -> float:
-        """Ritorna la durata totale in secondi"""
-        with self.lock:
-            if self.audio_data is None:
-                return 0.0
-            return len(self.audio_data) / self.sample_rate
+        """Ritorna la durata totale della voce corrente in secondi"""
+        buffer = self.buffer
+        if buffer is None:
+            return 0.0
+        return buffer.frames / buffer.sample_rate
+    
+    def get_stats(self) -> dict:
+        """Contatori del callback audio (xrun, underrun del sorgente, tempo massimo)"""
+        return {
+            'xruns': self.xruns,
+            'source_underruns': self.source_underruns,
+            'callbacks': self.callback_count,
+            'max_callback_ms': self.max_callback_time * 1000.0
+        }
 
 
 class DualAudioManager:
     """Gestisce due canali audio separati: main e preview"""
     
-    def __init__(self):
-        self.main_output = AudioOutput(name="Main")
-        self.preview_output = AudioOutput(name="Preview")
+    def __init__(self, cache_budget_mb: int = 1024, mmap_min_seconds: Optional[float] = 300.0,
+                 stream_min_seconds: Optional[float] = 300.0, stream_block_frames: int = 4096,
+                 stream_prefetch_blocks: int = 8, sample_rate: int = 44100):
+        # Frequenza fissa di entrambi i dispositivi: i file diversi vengono convertiti in decodifica
+        self.sample_rate = sample_rate
+        # Eventi di entrambe le uscite (posizione, fine cue, cambi di stato) per la UI
+        self.events = deque(maxlen=1024)
+        self.main_output = AudioOutput(name="Main", sample_rate=sample_rate, events=self.events)
+        self.preview_output = AudioOutput(name="Preview", sample_rate=sample_rate, events=self.events)
         self.current_audio = None
         self.preview_mode = False
         self.loop_enabled = False
+        # Cache dell'audio decodificato: il caricamento di una traccia già in cache non tocca il disco
+        self.cache = AudioCache(self.decode_audio_file, cache_budget_mb * 1024 * 1024)
+        # I WAV più lunghi di questa durata vengono letti via memory-map, o in streaming se
+        # vanno convertiti (None = mai)
+        self.mmap_min_seconds = mmap_min_seconds
+        # MP3/OGG/FLAC più lunghi di questa durata vengono decodificati in streaming (None = mai)
+        self.stream_min_seconds = stream_min_seconds
+        self.stream_block_frames = stream_block_frames
+        self.stream_prefetch_blocks = stream_prefetch_blocks
+        # Decisione streaming/cache per (percorso, mtime): evita sf.info a ogni caricamento
+        self.stream_decisions = {}
         
     def set_main_device(self, device_id: int):
         """Imposta il dispositivo per l'uscita principale"""
-        self.main_output.device_id = device_id
+        self.main_output.set_device(device_id)
         
     def set_preview_device(self, device_id: int):
         """Imposta il dispositivo per l'uscita preview"""
-        self.preview_output.device_id = device_id
+        self.preview_output.set_device(device_id)
+    
+    def configure_output(self, output: str, blocksize: Optional[int] = None, latency=None):
+        """Configura blocksize e latenza di un'uscita ('main' o 'preview')"""
+        audio_output = self.main_output if output == 'main' else self.preview_output
+        audio_output.set_stream_settings(blocksize, latency)
+    
+    def set_sample_rate(self, sample_rate: int):
+        """Imposta la frequenza fissa dei dispositivi; l'audio in cache va riconvertito"""
+        sample_rate = int(sample_rate)
+        if sample_rate == self.sample_rate:
+            return
+        self.sample_rate = sample_rate
+        self.cache.clear()
+        self.stream_decisions.clear()
+        self.main_output.set_sample_rate(sample_rate)
+        self.preview_output.set_sample_rate(sample_rate)
+    
+    def apply_audio_settings(self, settings: dict):
+        """Applica la sezione audio_settings di config.json
+        
+        sample_rate è unico per entrambe le uscite (l'audio condiviso in cache è convertito
+        una sola volta); buffer_size e latency valgono per entrambe e le sezioni 'main' e
+        'preview' possono sovrascriverli per il singolo dispositivo.
+        """
+        if settings.get('sample_rate'):
+            self.set_sample_rate(settings['sample_rate'])
+        for output in ('main', 'preview'):
+            override = settings.get(output, {})
+            self.configure_output(
+                output,
+                blocksize=override.get('buffer_size', settings.get('buffer_size')),
+                latency=override.get('latency', settings.get('latency'))
+            )
+    
+    def get_latency_report(self) -> dict:
+        """Latenza negoziata per entrambe le uscite"""
+        return {
+            'main': self.main_output.get_latency_info(),
+            'preview': self.preview_output.get_latency_info()
+        }
+    
+    def close(self):
+        """Chiude gli stream di entrambe le uscite"""
+        self.main_output.close()
+        self.preview_output.close()
     
     def set_main_volume(self, volume: float):
         """Imposta il volume dell'uscita principale (0.0 - 1.0)"""
@@ -222,34 +1386,217 @@ class DualAudioManager:
         self.main_output.set_trim(start_seconds, end_seconds)
         self.preview_output.set_trim(start_seconds, end_seconds)
         
-    def load_audio_file(self, filepath: str):
-        """Carica un file audio (supporta WAV, MP3 con scipy)"""
+    def load_audio_file(self, filepath: str, layer: bool = False):
+        """Carica un file audio (dalla cache se già decodificato)
+        
+        Con layer=True il cue in riproduzione sull'uscita principale continua a suonare su
+        un'altra voce del mixer.
+        """
         try:
-            file_ext = os.path.splitext(filepath)[1].lower()
-            
-            if file_ext == '.wav':
-                # Carica file WAV nativo
-                audio_data, sample_rate = self._load_wav(filepath)
-            elif file_ext in ['.mp3', '.ogg', '.flac']:
-                # Prova a caricare con soundfile (supporta molti formati)
-                try:
-                    import soundfile as sf
-                    audio_data, sample_rate = sf.read(filepath, dtype='float32')
-                except ImportError:
-                    raise Exception("Per file MP3/OGG/FLAC installa: pip install soundfile")
+            if self._should_stream(filepath):
+                # Ogni canale ha il proprio decoder, con cursore indipendente
+                self.main_output.load_buffer(self._open_stream(filepath), layer=layer)
+                self.preview_output.load_buffer(self._open_stream(filepath))
             else:
-                raise Exception(f"Formato non supportato: {file_ext}")
+                # Entrambi i canali condividono lo stesso buffer (nessuna copia)
+                buffer = self._load_cached(filepath)
+                self.main_output.load_buffer(buffer, layer=layer)
+                self.preview_output.load_buffer(buffer)
             
             self.current_audio = filepath
-            
-            # Carica su entrambi i canali
-            self.main_output.load_audio(audio_data, sample_rate)
-            self.preview_output.load_audio(audio_data.copy(), sample_rate)
             return True
         except Exception as e:
             print(f"Errore caricamento audio: {e}")
             return False
     
+    def fire(self, filepath: str, gain: float = 1.0, start_seconds: float = 0.0,
+             end_seconds: float = 0.0, loop: bool = False, fade_in: float = 0.0,
+             fade_out: float = 0.0, delay: float = 0.0, follow: Optional[int] = None,
+             follow_start: bool = False) -> int:
+        """Avvia un file sull'uscita principale su una voce aggiuntiva; ritorna l'indice della voce"""
+        try:
+            buffer = self._open_buffer(filepath)
+        except Exception as e:
+            print(f"Errore caricamento audio: {e}")
+            return -1
+        return self.main_output.fire(buffer, gain, start_seconds, end_seconds, loop, fade_in, fade_out,
+                                     delay, follow, follow_start)
+    
+    def schedule_cue(self, filepath: str, gain: float = 1.0, start_seconds: float = 0.0,
+                     end_seconds: float = 0.0, loop: bool = False, fade_in: float = 0.0,
+                     fade_out: float = 0.0, pre_wait: float = 0.0, after_current: bool = True) -> int:
+        """Arma il cue successivo sull'uscita principale; ritorna l'indice della voce
+        
+        Parte pre_wait secondi dopo la fine (after_current) o la partenza del cue corrente, con
+        precisione al campione; se il cue corrente non è ancora partito conta il suo prossimo
+        play. All'avvio l'engine pubblica un evento 'start' per la voce: promote_voice la rende
+        il cue corrente.
+        """
+        return self.fire(filepath, gain, start_seconds, end_seconds, loop, fade_in, fade_out,
+                         pre_wait, self.main_output.current_voice, follow_start=not after_current)
+    
+    def promote_voice(self, voice: int, filepath: str):
+        """Rende corrente sull'uscita principale una voce avviata in automatico"""
+        self.main_output.set_current_voice(voice)
+        try:
+            self.preview_output.load_buffer(self._open_buffer(filepath))
+        except Exception as e:
+            print(f"Errore caricamento audio: {e}")
+        self.current_audio = filepath
+    
+    def arm_standby(self, filepath: str, gain: float = 1.0, start_seconds: float = 0.0,
+                    end_seconds: float = 0.0, loop: bool = False, fade_in: float = 0.0,
+                    fade_out: float = 0.0) -> int:
+        """Tiene il cue successivo decodificato e armato sull'uscita principale; ritorna la voce"""
+        try:
+            buffer = self._open_buffer(filepath)
+        except Exception as e:
+            print(f"Errore caricamento audio: {e}")
+            return -1
+        return self.main_output.arm(buffer, gain, start_seconds, end_seconds, loop, fade_in, fade_out)
+    
+    def disarm_standby(self):
+        """Libera il cue successivo armato"""
+        self.main_output.disarm()
+    
+    def go_standby(self, voice: int, filepath: str, fade_seconds: float = 0.0) -> bool:
+        """Avvia il cue armato sulla voce indicata al posto di quelli in corso, senza pause"""
+        if not self.main_output.go(voice, fade_seconds):
+            return False
+        self.preview_mode = False
+        try:
+            self.preview_output.load_buffer(self._open_buffer(filepath))
+        except Exception as e:
+            print(f"Errore caricamento audio: {e}")
+        self.current_audio = filepath
+        return True
+    
+    def stop_voice(self, voice: int):
+        """Ferma una singola voce dell'uscita principale (e quelle in attesa della sua fine)"""
+        self.main_output.stop_voice(voice)
+    
+    def is_voice_active(self, voice: int) -> bool:
+        """Verifica se una voce dell'uscita principale suona o è in attesa di partire"""
+        return self.main_output.is_voice_active(voice)
+    
+    def _open_buffer(self, filepath: str) -> PCMBuffer:
+        """Buffer per una voce: decoder dedicato per i file in streaming, altrimenti dalla cache"""
+        if self._should_stream(filepath):
+            return self._open_stream(filepath)
+        return self._load_cached(filepath)
+    
+    def set_fades(self, fade_in: float, fade_out: float):
+        """Imposta le dissolvenze del cue corrente su entrambi i canali"""
+        self.main_output.set_fades(fade_in, fade_out)
+        self.preview_output.set_fades(fade_in, fade_out)
+    
+    def crossfade(self, seconds: float) -> bool:
+        """Avvia il cue corrente in dissolvenza incrociata con quelli in riproduzione"""
+        if self.preview_mode:
+            return self.preview_output.crossfade(seconds)
+        return self.main_output.crossfade(seconds)
+    
+    def set_voice_gain(self, gain: float):
+        """Imposta il guadagno del cue corrente (volume della traccia) su entrambi i canali"""
+        self.main_output.set_voice_gain(gain)
+        self.preview_output.set_voice_gain(gain)
+    
+    def _load_cached(self, filepath: str) -> PCMBuffer:
+        """Buffer dalla cache alla frequenza dei dispositivi"""
+        buffer = self.cache.load(filepath)
+        if buffer.sample_rate != self.sample_rate:
+            # Decodificato prima di un cambio di frequenza: scarta e riconverti
+            self.cache.clear()
+            buffer = self.cache.load(filepath)
+        return buffer
+    
+    def warm_cache(self, filepaths: List[str]):
+        """Pre-decodifica in background le tracce indicate (es. tutta la playlist)"""
+        # Le tracce lunghe riprodotte in streaming non vengono pre-decodificate
+        self.cache.warm(filepaths, skip=self._should_stream)
+    
+    def _should_stream(self, filepath: str) -> bool:
+        """Verifica se un file è abbastanza lungo da essere riprodotto in streaming
+        
+        Vale per MP3/OGG/FLAC lunghi e per i WAV lunghi da convertire, che non possono essere
+        mappati: in entrambi i casi la conversione avviene nel decoder, a blocchi.
+        """
+        file_ext = os.path.splitext(filepath)[1].lower()
+        if file_ext in ['.mp3', '.ogg', '.flac']:
+            if self.stream_min_seconds is None:
+                return False
+        elif file_ext != '.wav' or self.mmap_min_seconds is None:
+            return False
+        key = AudioCache._make_key(filepath)
+        if key is None:
+            return False
+        decision = self.stream_decisions.get(key)
+        if decision is None:
+            decision = self._probe_stream(filepath)
+            self.stream_decisions[key] = decision
+        return decision
+    
+    def _probe_stream(self, filepath: str) -> bool:
+        """Legge l'header del file per decidere se riprodurlo in streaming"""
+        try:
+            import soundfile as sf
+            info = sf.info(filepath)
+        except Exception:
+            return False
+        if os.path.splitext(filepath)[1].lower() == '.wav':
+            # Alla frequenza dei dispositivi il WAV lungo viene mappato, non decodificato
+            return (info.samplerate != self.sample_rate
+                    and info.frames >= self.mmap_min_seconds * info.samplerate)
+        return info.frames >= self.stream_min_seconds * info.samplerate
+    
+    def _open_stream(self, filepath: str) -> StreamingSource:
+        """Apre un decoder in streaming, convertito alla frequenza dei dispositivi"""
+        return StreamingSource(filepath, self.stream_block_frames, self.stream_prefetch_blocks,
+                               self.sample_rate)
+    
+    def decode_audio_file(self, filepath: str) -> PCMBuffer:
+        """Decodifica un file audio (WAV, MP3, OGG, FLAC) in un buffer float32 alla frequenza dei dispositivi"""
+        file_ext = os.path.splitext(filepath)[1].lower()
+        
+        if file_ext == '.wav':
+            # I WAV lunghi vengono mappati senza leggerli, gli altri caricati in memoria
+            mapped = self._map_wav(filepath)
+            if mapped is not None:
+                return mapped
+            audio_data, sample_rate = self._load_wav(filepath)
+        elif file_ext in ['.mp3', '.ogg', '.flac']:
+            # Prova a caricare con soundfile (supporta molti formati)
+            try:
+                import soundfile as sf
+                audio_data, sample_rate = sf.read(filepath, dtype='float32', always_2d=True)
+            except ImportError:
+                raise Exception("Per file MP3/OGG/FLAC installa: pip install soundfile")
+        else:
+            raise Exception(f"Formato non supportato: {file_ext}")
+        
+        if sample_rate != self.sample_rate:
+            # Conversione polifase una tantum: il callback non ricampiona mai
+            audio_data = resample(_to_float32(audio_data), sample_rate, self.sample_rate)
+        return PCMBuffer(audio_data, self.sample_rate)
+    
+    def _map_wav(self, filepath: str) -> Optional[MappedWavBuffer]:
+        """Mappa un WAV lungo in memoria virtuale; None se va caricato normalmente"""
+        if self.mmap_min_seconds is None:
+            return None
+        
+        with wave.open(filepath, 'rb') as wav_file:
+            sample_rate = wav_file.getframerate()
+            n_channels = wav_file.getnchannels()
+            n_frames = wav_file.getnframes()
+            sample_width = wav_file.getsampwidth()
+        
+        if n_frames < self.mmap_min_seconds * sample_rate or sample_rate != self.sample_rate:
+            return None
+        
+        data_offset, data_size = _find_wav_data_chunk(filepath)
+        n_frames = min(n_frames, data_size // (n_channels * sample_width))
+        return MappedWavBuffer(filepath, data_offset, n_frames, n_channels, sample_width, sample_rate)
+    
     def _load_wav(self, filepath: str) -> Tuple[np.ndarray, int]:
         """Carica un file WAV"""
         with wave.open(filepath, 'rb') as wav_file:
@@ -273,11 +1620,8 @@ class DualAudioManager:
             
             audio_data = np.frombuffer(audio_bytes, dtype=dtype)
             
-            # Reshape per stereo
-            if n_channels == 2:
-                audio_data = audio_data.reshape((-1, 2))
-            elif n_channels == 1:
-                audio_data = audio_data.reshape((-1, 1))
+            # Reshape in (frame, canali)
+            audio_data = audio_data.reshape((-1, n_channels))
             
             return audio_data, sample_rate
             
@@ -300,11 +1644,20 @@ class DualAudioManager:
         else:
             self.main_output.pause()
             
-    def stop(self):
-        """Ferma entrambi i canali"""
-        self.main_output.stop()
-        self.preview_output.stop()
+    def stop(self, fade_seconds: float = 0.0):
+        """Ferma entrambi i canali (con fade_seconds > 0 sfumando)"""
+        self.main_output.stop(fade_seconds)
+        self.preview_output.stop(fade_seconds)
         
+    def poll_events(self) -> List[AudioEvent]:
+        """Preleva tutti gli eventi pubblicati dall'engine dall'ultima chiamata"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                return events
+    
     def get_position(self) -> float:
         """Ottieni la posizione corrente"""
         if self.preview_mode:
@@ -316,8 +1669,21 @@ class DualAudioManager:
         return self.main_output.get_duration()
         
     def is_playing(self) -> bool:
-        """Verifica se è in riproduzione"""
+        """Verifica se è in riproduzione (qualsiasi voce)"""
         return self.main_output.is_playing or self.preview_output.is_playing
+    
+    def is_current_playing(self) -> bool:
+        """Verifica se il cue corrente è ancora in riproduzione"""
+        if self.preview_mode:
+            return self.preview_output.is_current_playing
+        return self.main_output.is_current_playing
+    
+    def get_stats(self) -> dict:
+        """Contatori del callback audio per entrambe le uscite"""
+        return {
+            'main': self.main_output.get_stats(),
+            'preview': self.preview_output.get_stats()
+        }
         
     @staticmethod
     def get_audio_devices() -> list:
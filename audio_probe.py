@@ -0,0 +1,123 @@
+"""
+Audio Probe Module
+Lettura in parallelo delle intestazioni dei file audio (durata, frequenza, canali) senza decodificarli
+"""
+
+import os
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, NamedTuple, Optional
+
+
+# cancel_futures di ThreadPoolExecutor.shutdown è disponibile da Python 3.9
+_CANCEL_FUTURES = 'cancel_futures' in ThreadPoolExecutor.shutdown.__code__.co_varnames
+
+
+class AudioInfo(NamedTuple):
+    """Formato di un file audio letto dall'intestazione"""
+    sample_rate: int
+    channels: int
+    frames: int
+
+    @property
+    def duration(self) -> float:
+        """Durata in secondi"""
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+
+def read_audio_info(filepath: str) -> AudioInfo:
+    """Legge solo l'intestazione del file (WAV con wave, gli altri formati con soundfile)"""
+    if os.path.splitext(filepath)[1].lower() == '.wav':
+        try:
+            with wave.open(filepath, 'rb') as wav_file:
+                return AudioInfo(wav_file.getframerate(), wav_file.getnchannels(),
+                                 wav_file.getnframes())
+        except (wave.Error, EOFError):
+            pass  # Es. WAV float o extensible non supportati da wave: prova con soundfile
+
+    try:
+        import soundfile as sf
+    except ImportError:
+        raise Exception("Per file MP3/OGG/FLAC installa: pip install soundfile")
+    info = sf.info(filepath)
+    return AudioInfo(info.samplerate, info.channels, info.frames)
+
+
+class AudioProbe:
+    """Legge le intestazioni su un pool di thread, con cache per percorso e data di modifica"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.entries = {}  # (path, mtime) -> AudioInfo
+        self.lock = threading.Lock()
+        self.executor = None
+
+    @staticmethod
+    def _make_key(filepath: str) -> Optional[tuple]:
+        """Chiave di cache: percorso assoluto + mtime"""
+        try:
+            return (os.path.abspath(filepath), os.path.getmtime(filepath))
+        except OSError:
+            return None
+
+    def get(self, filepath: str) -> Optional[AudioInfo]:
+        """Informazioni già in cache per la versione attuale del file, senza leggerlo"""
+        key = self._make_key(filepath)
+        with self.lock:
+            return self.entries.get(key)
+
+    def probe(self, filepath: str) -> Optional[AudioInfo]:
+        """Informazioni del file dalla cache o dall'intestazione; None se illeggibile"""
+        key = self._make_key(filepath)
+        if key is None:
+            return None
+        with self.lock:
+            info = self.entries.get(key)
+        if info is not None:
+            return info
+
+        try:
+            info = read_audio_info(filepath)
+        except Exception as e:
+            print(f"Errore lettura intestazione {filepath}: {e}")
+            return None
+
+        with self.lock:
+            # Le versioni precedenti dello stesso file non servono più
+            for old_key in [k for k in self.entries if k[0] == key[0]]:
+                del self.entries[old_key]
+            self.entries[key] = info
+        return info
+
+    def probe_many(self, filepaths: Iterable[str],
+                   callback: Callable[[str, Optional[AudioInfo]], None]):
+        """Legge le intestazioni in parallelo; callback(filepath, info) appena ognuna è pronta
+
+        Il callback viene chiamato dai thread del pool (o subito, per i file già in cache).
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix="audio-probe")
+            executor = self.executor
+
+        for filepath in filepaths:
+            info = self.get(filepath)
+            if info is not None:
+                callback(filepath, info)
+                continue
+            future = executor.submit(self.probe, filepath)
+            future.add_done_callback(
+                lambda f, path=filepath: callback(path, f.result() if not f.cancelled() else None))
+
+    def shutdown(self):
+        """Annulla le letture in coda e chiude il pool"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        if _CANCEL_FUTURES:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown(wait=False)
@@ -3,112 +3,186 @@ Auto Backup Module
 Gestisce il salvataggio automatico della playlist e configurazione
 """
 
-import os
+import hashlib
 import json
+import os
 import threading
 import time
 from datetime import datetime
-from pathlib import Path
+
+from persistence import atomic_write_bytes, atomic_write_json
 
 
 class AutoBackup:
-    """Gestisce il backup automatico"""
-    
-    def __init__(self, backup_dir: str = "backups", interval_seconds: int = 300):
+    """Gestisce il backup automatico
+
+    Il backup parte solo quando la playlist è cambiata (PlaylistManager.revision), dopo
+    debounce_seconds senza altre modifiche o al massimo interval_seconds dopo la prima.
+    I contenuti sono salvati una volta sola in objects/<sha256>.json; index.json elenca i
+    backup (dal più vecchio) e ne limita il numero.
+    """
+
+    def __init__(self, backup_dir: str = "backups", interval_seconds: int = 300,
+                 debounce_seconds: float = 10.0, keep: int = 10):
         self.backup_dir = backup_dir
-        self.interval = interval_seconds
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.index_file = os.path.join(backup_dir, "index.json")
+        self.interval = interval_seconds  # Attesa massima tra una modifica e il suo backup
+        self.debounce = debounce_seconds  # Quiete richiesta dopo l'ultima modifica
+        self.keep = keep  # Backup conservati
         self.running = False
         self.thread = None
+        self.wake = threading.Event()
+        self.lock = threading.Lock()  # Serializza i backup (thread di backup e chiusura)
         self.playlist_manager = None
         self.config_data = {}
-        
+        self.backed_up_revision = None  # Revisione della playlist dell'ultimo backup
+        self.index = None  # Voci di index.json, caricate alla prima richiesta
+
         # Crea la directory di backup se non esiste
-        os.makedirs(self.backup_dir, exist_ok=True)
-        
+        os.makedirs(self.objects_dir, exist_ok=True)
+
     def start(self, playlist_manager, config_data: dict):
         """Avvia il backup automatico"""
         self.playlist_manager = playlist_manager
         self.config_data = config_data
+        self.backed_up_revision = playlist_manager.snapshot().revision  # Lo stato caricato è già su disco
         self.running = True
+        self.wake.clear()
         self.thread = threading.Thread(target=self._backup_loop, daemon=True)
         self.thread.start()
-        
+
     def stop(self):
         """Ferma il backup automatico"""
         self.running = False
+        self.wake.set()
         if self.thread:
             self.thread.join(timeout=1)
-            
+
     def _backup_loop(self):
-        """Loop di backup"""
-        while self.running:
-            time.sleep(self.interval)
-            if self.running:
+        """Loop di backup: controlla il contatore delle modifiche una volta al secondo"""
+        seen_revision = self.backed_up_revision
+        first_change = last_change = None
+
+        while not self.wake.wait(1.0):
+            revision = self.playlist_manager.snapshot().revision
+            now = time.monotonic()
+            if revision == self.backed_up_revision:
+                first_change = last_change = None
+                continue
+
+            if revision != seen_revision or last_change is None:
+                seen_revision = revision
+                last_change = now
+                if first_change is None:
+                    first_change = now
+
+            if now - last_change >= self.debounce or now - first_change >= self.interval:
                 self.create_backup()
-                
+                first_change = last_change = None
+
     def create_backup(self):
-        """Crea un backup della playlist e configurazione"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Backup playlist
-            if self.playlist_manager and self.playlist_manager.get_track_count() > 0:
-                playlist_backup = os.path.join(self.backup_dir, f"playlist_backup_{timestamp}.json")
-                self.playlist_manager.save_playlist(playlist_backup)
-                
-            # Backup configurazione
-            if self.config_data:
-                config_backup = os.path.join(self.backup_dir, f"config_backup_{timestamp}.json")
-                with open(config_backup, 'w', encoding='utf-8') as f:
-                    json.dump(self.config_data, f, indent=2)
-                    
-            # Pulisci vecchi backup (mantieni solo gli ultimi 10)
-            self._cleanup_old_backups()
-            
-            return True
-        except Exception as e:
-            print(f"Errore durante il backup: {e}")
-            return False
-            
-    def _cleanup_old_backups(self):
-        """Rimuove i backup più vecchi, mantenendo solo gli ultimi 10"""
-        try:
-            # Lista tutti i file di backup
-            playlist_backups = sorted(
-                [f for f in os.listdir(self.backup_dir) if f.startswith("playlist_backup_")],
-                reverse=True
-            )
-            config_backups = sorted(
-                [f for f in os.listdir(self.backup_dir) if f.startswith("config_backup_")],
-                reverse=True
-            )
-            
-            # Rimuovi i file più vecchi
-            for backup_file in playlist_backups[10:]:
-                os.remove(os.path.join(self.backup_dir, backup_file))
-                
-            for backup_file in config_backups[10:]:
-                os.remove(os.path.join(self.backup_dir, backup_file))
-                
-        except Exception as e:
-            print(f"Errore pulizia backup: {e}")
-            
+        """Crea un backup della playlist e configurazione (nulla se identico all'ultimo)
+
+        La playlist viene letta dallo snapshot immutabile: serializzazione e scrittura non
+        toccano le tracce che il thread della GUI sta modificando.
+        """
+        with self.lock:
+            try:
+                snapshot = self.playlist_manager.snapshot() if self.playlist_manager else None
+                revision = snapshot.revision if snapshot else None
+
+                playlist_hash = None
+                if snapshot and snapshot.tracks:
+                    playlist_hash = self._store_object(snapshot.to_dict())
+                config_hash = self._store_object(self.config_data) if self.config_data else None
+
+                index = self._load_index()
+                latest = index[-1] if index else None
+                if (latest is None or latest['playlist'] != playlist_hash
+                        or latest['config'] != config_hash):
+                    index.append({
+                        'time': datetime.now().strftime("%Y%m%d_%H%M%S"),
+                        'playlist': playlist_hash,
+                        'config': config_hash
+                    })
+                    # Mantieni solo gli ultimi backup
+                    self._cleanup_old_backups(index)
+
+                self.backed_up_revision = revision
+                return True
+            except Exception as e:
+                print(f"Errore durante il backup: {e}")
+                return False
+
+    def _object_path(self, digest: str) -> str:
+        """Percorso del contenuto con l'hash dato"""
+        return os.path.join(self.objects_dir, f"{digest}.json")
+
+    def _store_object(self, data) -> str:
+        """Salva il contenuto JSON se non esiste già; ritorna il suo hash"""
+        content = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            atomic_write_bytes(path, content)
+        return digest
+
+    def _load_index(self) -> list:
+        """Voci dei backup dal più vecchio al più recente"""
+        if self.index is None:
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)['backups']
+            except FileNotFoundError:
+                self.index = []
+            except (ValueError, KeyError) as e:
+                print(f"Indice backup non valido, ricreato: {e}")
+                self.index = []
+        return self.index
+
+    def _cleanup_old_backups(self, index: list):
+        """Salva l'indice con gli ultimi backup e rimuove i contenuti non più usati"""
+        removed = index[:-self.keep] if len(index) > self.keep else []
+        del index[:len(removed)]
+        atomic_write_json(self.index_file, {'backups': index}, indent=2)
+
+        in_use = {entry[kind] for entry in index for kind in ('playlist', 'config')}
+        for entry in removed:
+            for digest in (entry['playlist'], entry['config']):
+                if digest and digest not in in_use:
+                    try:
+                        os.remove(self._object_path(digest))
+                    except OSError as e:
+                        print(f"Errore pulizia backup: {e}")
+                    in_use.add(digest)  # Già rimosso
+
     def get_latest_backup(self) -> tuple:
         """Ritorna i path dell'ultimo backup (playlist, config)"""
         try:
-            playlist_backups = sorted(
-                [f for f in os.listdir(self.backup_dir) if f.startswith("playlist_backup_")],
-                reverse=True
-            )
-            config_backups = sorted(
-                [f for f in os.listdir(self.backup_dir) if f.startswith("config_backup_")],
-                reverse=True
-            )
-            
-            playlist_path = os.path.join(self.backup_dir, playlist_backups[0]) if playlist_backups else None
-            config_path = os.path.join(self.backup_dir, config_backups[0]) if config_backups else None
-            
-            return playlist_path, config_path
+            with self.lock:
+                index = self._load_index()
+                for entry in reversed(index):
+                    if entry['playlist']:
+                        playlist_path = self._object_path(entry['playlist'])
+                        config_path = self._object_path(entry['config']) if entry['config'] else None
+                        return playlist_path, config_path
+
+            # Backup delle versioni precedenti (un file per backup)
+            return self._get_latest_legacy_backup()
         except Exception as e:
             print(f"Errore recupero backup: {e}")
             return None, None
+
+    def _get_latest_legacy_backup(self) -> tuple:
+        """Ultimo backup nel vecchio formato playlist_backup_<data>.json"""
+        playlist_backups, config_backups = [], []
+        for name in os.listdir(self.backup_dir):
+            if name.startswith("playlist_backup_"):
+                playlist_backups.append(name)
+            elif name.startswith("config_backup_"):
+                config_backups.append(name)
+
+        playlist_path = os.path.join(self.backup_dir, max(playlist_backups)) if playlist_backups else None
+        config_path = os.path.join(self.backup_dir, max(config_backups)) if config_backups else None
+        return playlist_path, config_path
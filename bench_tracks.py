@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark AudioTrack - Audio Manager Teatrale
+Confronta memoria e tempi di salvataggio/caricamento di AudioTrack con la vecchia dataclass
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+
+from playlist_manager import AudioTrack
+
+
+@dataclass
+class DataclassAudioTrack:
+    """Replica della precedente AudioTrack (dataclass con __dict__ e asdict)"""
+    filepath: str
+    title: str
+    duration: float = 0.0
+    index: int = 0
+    notes: str = ""
+    color: str = ""
+    loop: bool = False
+    hotkey: str = ""
+    volume: int = 100
+    start_time: float = 0.0
+    end_time: float = 0.0
+    fade_in: float = 0.0
+    fade_out: float = 0.0
+    crossfade: float = 0.0
+    continue_mode: str = ""
+    pre_wait: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data: dict):
+        return DataclassAudioTrack(**data)
+
+
+def make_records(count: int) -> list:
+    """Dizionari di tracce come quelli salvati nelle playlist"""
+    return [{
+        'filepath': f"/show/audio/scena_{i // 50:03d}/cue_{i:05d}.wav",
+        'title': f"Cue {i:05d}",
+        'duration': 30.0 + i % 300,
+        'notes': "Entrata attori" if i % 7 == 0 else "",
+        'color': "#ff0000" if i % 5 == 0 else "",
+        'loop': i % 11 == 0,
+        'hotkey': "",
+        'volume': 100,
+        'start_time': 0.0,
+        'end_time': 0.0,
+        'fade_in': 0.5 if i % 3 == 0 else 0.0,
+        'fade_out': 0.0,
+        'crossfade': 0.0,
+        'continue_mode': "",
+        'pre_wait': 0.0,
+    } for i in range(count)]
+
+
+def measure(track_class, records: list, repeats: int) -> dict:
+    """Memoria delle istanze e tempi (migliori su repeats) di caricamento e salvataggio"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracks = [track_class.from_dict(dict(record)) for record in records]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Solo le allocazioni degli oggetti traccia (le stringhe sono condivise con i record)
+    memory = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    text = json.dumps({'tracks': [track.to_dict() for track in tracks]})
+
+    save_times, load_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        json.dumps({'tracks': [track.to_dict() for track in tracks]})
+        save_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        [track_class.from_dict(data) for data in json.loads(text)['tracks']]
+        load_times.append(time.perf_counter() - start)
+
+    return {'memory': memory, 'save': min(save_times), 'load': min(load_times)}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeats = 5
+    records = make_records(count)
+
+    print("=" * 70)
+    print(f" ⏱  BENCHMARK AUDIOTRACK - {count} tracce, migliore di {repeats}")
+    print("=" * 70)
+
+    results = {
+        'dataclass': measure(DataclassAudioTrack, records, repeats),
+        '__slots__': measure(AudioTrack, records, repeats),
+    }
+
+    print(f"  {'':12} {'memoria':>14} {'salvataggio':>14} {'caricamento':>14}")
+    for name, result in results.items():
+        print(f"  {name:12} {result['memory'] / 1024 / 1024:11.2f} MB "
+              f"{result['save'] * 1000:11.1f} ms {result['load'] * 1000:11.1f} ms")
+
+    old, new = results['dataclass'], results['__slots__']
+    print()
+    print(f"  Memoria: {old['memory'] / max(1, new['memory']):.1f}x in meno, "
+          f"salvataggio {old['save'] / new['save']:.1f}x, caricamento {old['load'] / new['load']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,8 +22,15 @@ def main():
     print("📱 FILE APPLICAZIONE:")
     app_files = {
         "main.py": "GUI principale",
+        "engine_server.py": "Engine senza interfaccia (socket)",
         "audio_manager.py": "Engine audio dual-output",
+        "audio_cache.py": "Cache audio decodificato",
+        "resampler.py": "Conversione frequenza di campionamento",
+        "waveform_peaks.py": "Picchi forma d'onda",
         "playlist_manager.py": "Gestione playlist",
+        "audio_probe.py": "Lettura durate dalle intestazioni",
+        "persistence.py": "Scritture atomiche e journal",
+        "show_format.py": "Formato show binario .amshow",
         "auto_backup.py": "Sistema backup automatico"
     }
     
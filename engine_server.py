@@ -0,0 +1,400 @@
+"""
+Engine Server Module
+Servizio senza interfaccia grafica: engine audio e playlist controllabili da un socket locale
+
+Protocollo: una riga JSON per messaggio.
+  Richiesta: {"id": 1, "cmd": "go"}           Risposta: {"id": 1, "ok": true, "result": {...}}
+  Errore:                                     {"id": 1, "ok": false, "error": "..."}
+  Dopo "subscribe" il client riceve anche {"event": {...}} e {"status": {...}}.
+
+Comandi: go, stop [fade], fire {cue | hotkey}, volume {output, value 0-100}, status,
+subscribe, unsubscribe, load {path}.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import stat
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from audio_manager import DualAudioManager
+from playlist_manager import PlaylistManager
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7770
+EVENT_INTERVAL = 0.02  # Secondi tra due letture degli eventi dell'engine
+STATUS_INTERVAL = 0.1  # Secondi tra due stati inviati agli iscritti durante la riproduzione
+SUBSCRIBER_QUEUE = 256  # Eventi in attesa per iscritto (i più vecchi vengono scartati)
+
+
+class CommandError(Exception):
+    """Comando non valido: il messaggio viene restituito al client"""
+
+
+class EngineService:
+    """Engine audio e playlist comandati da più client, senza Tk
+
+    I comandi girano nel loop asyncio, quindi la playlist viene toccata da un solo thread come
+    nella GUI; tutto ciò che può decodificare audio (avvio dei cue, pre-caricamento del
+    successivo) va su un executor, così un file lento non blocca gli altri client.
+    """
+
+    def __init__(self, audio_manager: DualAudioManager, playlist_manager: PlaylistManager):
+        self.audio_manager = audio_manager
+        self.playlist_manager = playlist_manager
+        self.subscribers = set()  # ClientOutbox dei client iscritti
+        self.started = False  # Il cue corrente è già stato avviato (il prossimo GO avanza)
+        self.standby = None  # (traccia, future della voce) del cue successivo armato o in armamento
+        # Pre-caricamenti su un solo thread: finiscono nell'ordine richiesto, quindi l'ultimo
+        # armato nell'engine è sempre quello in self.standby
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.last_status = 0.0
+        self.go_lock = asyncio.Lock()  # Un GO alla volta: il successivo parte dopo il precedente
+        self.commands = {
+            'go': self.cmd_go,
+            'stop': self.cmd_stop,
+            'fire': self.cmd_fire,
+            'volume': self.cmd_volume,
+            'status': self.cmd_status,
+            'load': self.cmd_load,
+        }
+
+    async def dispatch(self, request: dict) -> dict:
+        """Esegue un comando e ritorna il risultato (CommandError se non valido)"""
+        command = self.commands.get(request.get('cmd'))
+        if command is None:
+            raise CommandError(f"comando sconosciuto: {request.get('cmd')}")
+        result = command(request)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    # Comandi
+
+    async def cmd_go(self, request: dict) -> dict:
+        """Avvia il cue al cursore della playlist, o il successivo se è già stato avviato"""
+        async with self.go_lock:
+            index = self._go_index()
+            track = self.playlist_manager.get_track(index)
+            if track is None:
+                raise CommandError("fine playlist")
+
+            playing = self.audio_manager.is_playing()
+            standby, self.standby = self.standby, None
+            voice = -1
+            if playing and standby is not None and standby[0] is track:
+                try:
+                    voice = await asyncio.wrap_future(standby[1])  # Attende un armamento in corso
+                except Exception as e:
+                    print(f"Errore pre-caricamento: {e}")
+            self.playlist_manager.set_current_track(index)
+            self.started = True
+            await asyncio.get_running_loop().run_in_executor(None, self._start_cue, track, voice)
+
+            self._arm_next()
+        return self.cmd_status(request)
+
+    def cmd_stop(self, request: dict) -> dict:
+        """Ferma tutto, sfumando per 'fade' secondi se indicato"""
+        self.audio_manager.stop(float(request.get('fade', 0.0)))
+        return self.cmd_status(request)
+
+    async def cmd_fire(self, request: dict) -> dict:
+        """Avvia un cue sopra a quelli in corso (per indice 'cue' o per 'hotkey')"""
+        if 'hotkey' in request:
+            track = self.playlist_manager.get_track_by_hotkey(str(request['hotkey']))
+        else:
+            track = self.playlist_manager.get_track(int(request.get('cue', -1)))
+        if track is None:
+            raise CommandError("cue non trovato")
+
+        fire = functools.partial(self.audio_manager.fire, track.filepath, track.volume / 100.0,
+                                 track.start_time, track.end_time, track.loop, track.fade_in,
+                                 track.fade_out)
+        voice = await asyncio.get_running_loop().run_in_executor(None, fire)
+        if voice < 0:
+            raise CommandError(f"impossibile avviare: {track.filepath}")
+        return {'voice': voice, 'title': track.title}
+
+    def cmd_volume(self, request: dict) -> dict:
+        """Imposta il volume generale di un'uscita ('main' o 'preview', 0-100)"""
+        value = max(0.0, min(100.0, float(request['value']))) / 100.0
+        output = request.get('output', 'main')
+        if output == 'main':
+            self.audio_manager.set_main_volume(value)
+        elif output == 'preview':
+            self.audio_manager.set_preview_volume(value)
+        else:
+            raise CommandError(f"uscita sconosciuta: {output}")
+        return self.cmd_status(request)
+
+    def cmd_status(self, request: Optional[dict] = None) -> dict:
+        """Stato corrente di riproduzione e playlist"""
+        track = self.playlist_manager.get_current_track()
+        return {
+            'playing': self.audio_manager.is_playing(),
+            'current_index': self.playlist_manager.current_index,
+            'title': track.title if track else None,
+            'position': self.audio_manager.get_position(),
+            'duration': self.audio_manager.get_duration(),
+            'main_volume': round(self.audio_manager.get_main_volume() * 100),
+            'preview_volume': round(self.audio_manager.get_preview_volume() * 100),
+            'tracks': self.playlist_manager.get_track_count(),
+        }
+
+    async def cmd_load(self, request: dict) -> dict:
+        """Carica una playlist (JSON o .amshow) e la prepara per il primo GO"""
+        async with self.go_lock:  # Non durante l'avvio di un cue della playlist precedente
+            success, _ = self.playlist_manager.load_playlist(str(request['path']))
+            if not success:
+                raise CommandError(f"impossibile caricare: {request['path']}")
+            self.started = False
+            self.audio_manager.warm_cache([track.filepath for track in self.playlist_manager.tracks])
+            self._disarm()
+            self._arm_next()
+        return self.cmd_status(request)
+
+    # Cue successivo pre-caricato
+
+    def _start_cue(self, track, voice: int):
+        """Avvia il cue dalla voce armata o, se non c'è, caricandolo (su un executor)"""
+        if voice >= 0 and self.audio_manager.go_standby(voice, track.filepath, track.crossfade):
+            return
+        # Nessun cue armato (o nulla in riproduzione): caricamento come nella GUI
+        self.audio_manager.stop()
+        self._load_and_play(track)
+
+    def _load_and_play(self, track):
+        """Carica il cue corrente nell'engine e lo avvia sull'uscita principale"""
+        if not self.audio_manager.load_audio_file(track.filepath):
+            raise CommandError(f"impossibile caricare: {track.filepath}")
+        self.audio_manager.set_loop(track.loop)
+        self.audio_manager.set_trim(track.start_time, track.end_time)
+        self.audio_manager.set_fades(track.fade_in, track.fade_out)
+        self.audio_manager.set_voice_gain(track.volume / 100.0)
+        self.audio_manager.play_main()
+
+    def _go_index(self) -> int:
+        """Indice del cue che verrà avviato dal prossimo GO"""
+        index = self.playlist_manager.current_index
+        if index < 0:
+            return 0
+        return index + 1 if self.started else index
+
+    def _disarm(self):
+        """Libera il cue successivo armato (dopo gli armamenti già avviati)"""
+        if self.standby is not None:
+            self.standby[1].cancel()
+            self.standby = None
+            self.loader.submit(self.audio_manager.disarm_standby)
+
+    def _arm_next(self):
+        """Decodifica e arma il cue successivo sul thread dei pre-caricamenti"""
+        track = self.playlist_manager.get_track(self._go_index())
+        if self.standby is not None and self.standby[0] is track:
+            return
+        if track is None:
+            self._disarm()
+            return
+
+        if self.standby is not None:
+            self.standby[1].cancel()  # Se non è ancora partito non tocca l'engine
+        future = self.loader.submit(
+            self.audio_manager.arm_standby, track.filepath, track.volume / 100.0,
+            track.start_time, track.end_time, track.loop, track.fade_in, track.fade_out)
+        self.standby = (track, future)
+
+    # Iscritti
+
+    def publish(self, message: dict):
+        """Accoda un evento a tutti gli iscritti (scartando i più vecchi se un client è lento)"""
+        for outbox in self.subscribers:
+            outbox.publish(message)
+
+    async def pump_events(self):
+        """Inoltra agli iscritti gli eventi dell'engine e lo stato durante la riproduzione"""
+        while True:
+            await asyncio.sleep(EVENT_INTERVAL)
+            events = self.audio_manager.poll_events()
+            if not self.subscribers:
+                continue
+            for event in events:
+                self.publish({'event': event._asdict()})
+
+            now = time.monotonic()
+            if events or (now - self.last_status >= STATUS_INTERVAL and self.audio_manager.is_playing()):
+                self.last_status = now
+                self.publish({'status': self.cmd_status()})
+
+
+class ClientOutbox:
+    """Messaggi da inviare a un client: le risposte non vengono mai scartate, gli eventi
+    sì (i più vecchi) quando il client non riesce a leggerli in tempo"""
+
+    def __init__(self):
+        self.replies = deque()
+        self.events = deque(maxlen=SUBSCRIBER_QUEUE)
+        self.ready = asyncio.Event()
+
+    def reply(self, message: dict):
+        self.replies.append(message)
+        self.ready.set()
+
+    def publish(self, message: dict):
+        self.events.append(message)
+        self.ready.set()
+
+    async def get(self) -> dict:
+        """Prossimo messaggio, con le risposte prima degli eventi"""
+        while not self.replies and not self.events:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.replies.popleft() if self.replies else self.events.popleft()
+
+
+class EngineServer:
+    """Server asyncio a righe JSON su TCP locale o socket Unix"""
+
+    def __init__(self, service: EngineService):
+        self.service = service
+        self.server = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    unix_path: Optional[str] = None):
+        """Apre il socket di controllo e avvia l'inoltro degli eventi"""
+        if unix_path:
+            if os.path.exists(unix_path):
+                # Solo un socket rimasto da un avvio precedente può essere sostituito
+                if not stat.S_ISSOCK(os.stat(unix_path).st_mode):
+                    raise OSError(f"{unix_path} esiste e non è un socket")
+                os.remove(unix_path)
+            self.server = await asyncio.start_unix_server(self._handle_client, path=unix_path)
+            print(f"Engine in ascolto su {unix_path}")
+        else:
+            self.server = await asyncio.start_server(self._handle_client, host, port)
+            print(f"Engine in ascolto su {host}:{port}")
+        asyncio.get_running_loop().create_task(self.service.pump_events())
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Legge i comandi di un client; risposte ed eventi vengono scritti da un solo task"""
+        outbox = ClientOutbox()
+        sender = asyncio.get_running_loop().create_task(self._send_loop(outbox, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                outbox.reply(await self._handle_line(line, outbox))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.service.subscribers.discard(outbox)
+            sender.cancel()
+            writer.close()
+
+    async def _handle_line(self, line: bytes, outbox: ClientOutbox) -> dict:
+        """Esegue una richiesta e prepara la risposta"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {'ok': False, 'error': f"JSON non valido: {e}"}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "la richiesta deve essere un oggetto JSON"}
+
+        response = {'id': request.get('id')}
+        command = request.get('cmd')
+        try:
+            if command == 'subscribe':
+                self.service.subscribers.add(outbox)
+                result = self.service.cmd_status(request)
+            elif command == 'unsubscribe':
+                self.service.subscribers.discard(outbox)
+                result = {}
+            else:
+                result = await self.service.dispatch(request)
+            response.update(ok=True, result=result)
+        except CommandError as e:
+            response.update(ok=False, error=str(e))
+        except (KeyError, TypeError, ValueError) as e:
+            response.update(ok=False, error=f"parametri non validi: {e}")
+        return response
+
+    @staticmethod
+    async def _send_loop(outbox: ClientOutbox, writer: asyncio.StreamWriter):
+        """Scrive al client risposte ed eventi"""
+        try:
+            while True:
+                message = await outbox.get()
+                writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+def _load_audio_settings() -> dict:
+    """Sezione audio_settings di config.json accanto al programma (come la GUI)"""
+    config_file = Path(__file__).resolve().parent / "config.json"
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('audio_settings', {})
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Errore lettura {config_file}: {e}")
+        return {}
+
+
+async def run(args):
+    """Crea engine, playlist e server e resta in ascolto"""
+    audio_manager = DualAudioManager()
+    audio_manager.apply_audio_settings(_load_audio_settings())
+    if args.main_device is not None:
+        audio_manager.set_main_device(args.main_device)
+    if args.preview_device is not None:
+        audio_manager.set_preview_device(args.preview_device)
+
+    service = EngineService(audio_manager, PlaylistManager())
+    server = EngineServer(service)
+    try:
+        await server.start(args.host, args.port, args.unix)
+        if args.playlist:
+            await service.cmd_load({'path': args.playlist})
+        await server.serve_forever()
+    finally:
+        service.loader.shutdown(wait=False)
+        service.playlist_manager.probe.shutdown()
+        audio_manager.close()
+
+
+def main():
+    """Avvio da riga di comando: python engine_server.py --playlist show.json"""
+    parser = argparse.ArgumentParser(description="Engine audio senza interfaccia, comandato via socket")
+    parser.add_argument('--playlist', help="Playlist da caricare (JSON o .amshow)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Indirizzo TCP (solo locale)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Porta TCP")
+    parser.add_argument('--unix', help="Socket Unix al posto di TCP")
+    parser.add_argument('--main-device', type=int, help="ID del dispositivo principale")
+    parser.add_argument('--preview-device', type=int, help="ID del dispositivo preview")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Errore avvio engine: {e}")
+
+
+if __name__ == "__main__":
+    main()
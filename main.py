@@ -5,12 +5,16 @@ Interfaccia grafica principale con tutte le funzionalità avanzate
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser, simpledialog
+import bisect
+import queue
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from audio_manager import DualAudioManager
 from playlist_manager import PlaylistManager
 from auto_backup import AutoBackup
+from persistence import JournaledFile
+from waveform_peaks import PeakCache
 from typing import Optional
 import json
 
@@ -42,18 +46,36 @@ class AudioManagerGUI:
         self.config_dir = Path.home() / ".audio_manager"
         self.config_dir.mkdir(exist_ok=True)
         self.last_session_file = self.config_dir / "last_session.json"
+        # Picchi della forma d'onda calcolati una volta per file
+        self.peak_cache = PeakCache(self.config_dir / "peaks")
+        
+        # Impostazioni applicazione (config.json accanto al programma)
+        self.app_config = self._load_app_config()
         
         # Managers
         self.audio_manager = DualAudioManager()
+        self.audio_manager.apply_audio_settings(self.app_config.get('audio_settings', {}))
         self.playlist_manager = PlaylistManager()
-        self.auto_backup = AutoBackup(interval_seconds=300)  # Backup ogni 5 minuti
+        # Sessione: stato completo + journal delle modifiche alla playlist (recupero dopo un crash)
+        self.session_file = JournaledFile(self.last_session_file, self._session_config)
+        self.auto_backup = AutoBackup(interval_seconds=300)  # Backup dopo ogni modifica (al massimo 5 minuti dopo)
         
         # Stato
         self.is_playing = False
         self.is_preview = False
-        self.update_thread = None
+        self.event_pump_active = False  # Lettura eventi dell'engine in corso (solo durante la riproduzione)
+        self.pending_continuation = None  # (voce, traccia) armata per l'avvio automatico
+        self.standby = None  # (voce, traccia, parametri) del cue successivo pre-caricato nell'engine
+        self.standby_request = None  # (traccia, parametri) dell'ultimo pre-caricamento richiesto
+        # Pre-caricamenti in ordine su un solo thread: la decodifica non blocca mai la GUI
+        self.standby_executor = ThreadPoolExecutor(max_workers=1)
         self.running = True
-        self.hotkey_map = {}  # Mappa hotkey -> track index
+        self.track_rows = {}  # uid traccia -> (traccia, iid, valori, tag) delle righe mostrate
+        self.color_tags = set()  # Tag colore già configurati nella Treeview
+        # Risultati dei thread di lavoro (durate, forma d'onda, pre-caricamenti): Tk non è
+        # thread-safe, vengono applicati solo da _pump_worker_results nel thread della GUI
+        self.worker_results = queue.Queue()  # (tipo, dati)
+        self.worker_jobs = 0  # Lavori avviati il cui risultato non è ancora stato applicato
         
         # Waveform
         self.waveform_figure = None
@@ -67,16 +89,26 @@ class AudioManagerGUI:
         
         # Carica ultima sessione se disponibile (DOPO aver caricato i dispositivi)
         self._load_last_session()
+        self._attach_session_journal()
         
         # Avvia backup automatico
         self._start_auto_backup()
         
-        # Avvia thread di aggiornamento
-        self._start_update_thread()
-        
         # Gestione chiusura
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
     
+    def _load_app_config(self) -> dict:
+        """Legge config.json dalla cartella del programma (default se assente o non valido)"""
+        config_file = Path(__file__).resolve().parent / "config.json"
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Errore lettura {config_file}: {e}")
+            return {}
+    
     def _setup_dark_theme(self):
         """Configura il tema scuro per uso teatrale al buio"""
         # Colori del tema scuro
@@ -177,6 +209,7 @@ class AudioManagerGUI:
         file_menu.add_command(label="Carica Playlist...", command=self._load_playlist)
         file_menu.add_separator()
         file_menu.add_command(label="Ripristina Backup...", command=self._restore_backup)
+        file_menu.add_command(label="Latenza Audio...", command=self._show_latency_report)
         file_menu.add_separator()
         file_menu.add_command(label="Esci", command=self._on_closing)
         
@@ -248,6 +281,8 @@ class AudioManagerGUI:
         ttk.Button(toolbar, text="🎨 Colore", command=self._edit_track_color).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="🔊 Volume", command=self._edit_track_volume).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="✂️ Taglia", command=self._edit_track_trim).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="〰 Dissolvenze", command=self._edit_track_fades).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="⏭ Auto", command=self._edit_track_continue).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="⌨️ Hotkey", command=self._edit_track_hotkey).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="🎹 Auto F1-F12", command=self._auto_assign_hotkeys).pack(side=tk.LEFT, padx=2)
         
@@ -348,7 +383,7 @@ class AudioManagerGUI:
         self.next_btn.pack(side=tk.LEFT, padx=5)
         
         # Status bar
-        self.status_label = ttk.Label(self.root, text="Pronto | Backup automatico attivo ogni 5 minuti", 
+        self.status_label = ttk.Label(self.root, text="Pronto | Backup automatico attivo", 
                                        relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
         
@@ -370,81 +405,127 @@ class AudioManagerGUI:
         self.waveform_ax.spines['left'].set_color(self.colors['border'])
         self.waveform_ax.spines['right'].set_color(self.colors['border'])
         
-        # Linea di posizione (inizialmente nascosta)
+        # Linea di posizione (inizialmente nascosta), disegnata in blit sopra lo sfondo salvato
         self.waveform_position_line = None
+        self.waveform_background = None
         
         self.waveform_canvas = FigureCanvasTkAgg(self.waveform_figure, self.waveform_frame)
         self.waveform_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.waveform_canvas.mpl_connect('draw_event', self._on_waveform_draw)
         
     def _update_waveform(self):
         """Aggiorna la visualizzazione della forma d'onda"""
         if not MATPLOTLIB_AVAILABLE or not self.waveform_ax:
             return
-            
-        self.waveform_ax.clear()
         
-        # Riapplica stile scuro dopo clear
+        buffer = self.audio_manager.main_output.buffer
+        filepath = self.audio_manager.current_audio
+        if buffer is None or filepath is None:
+            self._draw_waveform_message('Nessun audio caricato')
+            return
+        
+        # Piramide già in memoria: disegno immediato
+        pyramid = self.peak_cache.cached(filepath)
+        if pyramid is not None:
+            self._draw_waveform_peaks(filepath, pyramid)
+            return
+        
+        # Altrimenti caricata dal disco o calcolata in background
+        self._draw_waveform_message('Calcolo forma d\'onda...')
+        
+        def load_peaks():
+            pyramid = None
+            try:
+                pyramid = self.peak_cache.get(filepath, buffer)
+            except Exception as e:
+                print(f"Errore calcolo forma d'onda: {e}")
+            # Sempre un risultato, anche vuoto: il lavoro va contato come concluso
+            self.worker_results.put(('peaks', (filepath, pyramid)))
+        
+        self._watch_workers(1)
+        threading.Thread(target=load_peaks, daemon=True).start()
+    
+    def _reset_waveform_axes(self):
+        """Svuota il grafico della forma d'onda riapplicando lo stile scuro"""
+        self.waveform_ax.clear()
+        self.waveform_position_line = None
         self.waveform_ax.set_facecolor(self.colors['bg_widget'])
         self.waveform_ax.tick_params(colors=self.colors['fg'], which='both')
         self.waveform_ax.spines['bottom'].set_color(self.colors['border'])
         self.waveform_ax.spines['top'].set_color(self.colors['border'])
         self.waveform_ax.spines['left'].set_color(self.colors['border'])
         self.waveform_ax.spines['right'].set_color(self.colors['border'])
-        
-        # Ottieni i dati audio
-        if self.audio_manager.main_output.audio_data is not None:
-            audio_data = self.audio_manager.main_output.audio_data
-            sample_rate = self.audio_manager.main_output.sample_rate
-            
-            # Downsampling per visualizzazione (max 10000 punti)
-            if len(audio_data) > 10000:
-                step = len(audio_data) // 10000
-                audio_data = audio_data[::step]
-            
-            # Converti in mono se stereo
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.mean(axis=1)
-            
-            # Crea asse temporale
-            time_axis = np.arange(len(audio_data)) / sample_rate * (len(self.audio_manager.main_output.audio_data) / len(audio_data))
-            
-            # Plotta con colore accento
-            self.waveform_ax.plot(time_axis, audio_data, linewidth=0.5, color=self.colors['accent'])
-            self.waveform_ax.set_title("Forma d'Onda", color=self.colors['fg'])
-            self.waveform_ax.set_xlabel("Tempo (s)", color=self.colors['fg'])
-            self.waveform_ax.set_ylabel("Ampiezza", color=self.colors['fg'])
-            self.waveform_ax.grid(True, alpha=0.2, color=self.colors['fg_dim'])
-            
-        else:
-            self.waveform_ax.text(0.5, 0.5, 'Nessun audio caricato', 
-                                  ha='center', va='center', transform=self.waveform_ax.transAxes,
-                                  color=self.colors['fg_dim'])
-        
+    
+    def _draw_waveform_message(self, message: str):
+        """Mostra un messaggio al posto della forma d'onda"""
+        self._reset_waveform_axes()
+        self.waveform_ax.text(0.5, 0.5, message,
+                              ha='center', va='center', transform=self.waveform_ax.transAxes,
+                              color=self.colors['fg_dim'])
         self.waveform_canvas.draw()
     
-    def _update_waveform_position(self, position_seconds: float):
-        """Aggiorna la linea di posizione sul waveform"""
-        if not MATPLOTLIB_AVAILABLE or not self.waveform_ax:
-            return
+    def _draw_waveform_peaks(self, filepath: str, pyramid):
+        """Disegna i picchi min/max della traccia, una colonna per pixel"""
+        if filepath != self.audio_manager.current_audio:
+            return  # Nel frattempo è stata caricata un'altra traccia
         
-        # Rimuovi la vecchia linea se esiste
-        if self.waveform_position_line is not None:
-            self.waveform_position_line.remove()
-            self.waveform_position_line = None
+        self._reset_waveform_axes()
+        
+        # Il livello della piramide dipende dalla larghezza del grafico, non dalla durata
+        pixels = max(200, self.waveform_canvas.get_tk_widget().winfo_width())
+        time_axis, peak_min, peak_max = pyramid.render(0.0, pyramid.duration, pixels)
+        
+        # Plotta con colore accento
+        self.waveform_ax.fill_between(time_axis, peak_min, peak_max, linewidth=0,
+                                      color=self.colors['accent'], step='post')
+        self.waveform_ax.set_xlim(0.0, max(pyramid.duration, 0.001))
+        self.waveform_ax.set_title("Forma d'Onda", color=self.colors['fg'])
+        self.waveform_ax.set_xlabel("Tempo (s)", color=self.colors['fg'])
+        self.waveform_ax.set_ylabel("Ampiezza", color=self.colors['fg'])
+        self.waveform_ax.grid(True, alpha=0.2, color=self.colors['fg_dim'])
         
-        # Disegna la nuova linea verticale rossa
+        # Playhead animato: escluso dal disegno completo, aggiornato solo in blit
         self.waveform_position_line = self.waveform_ax.axvline(
-            x=position_seconds, 
+            x=0.0,
             color='#ff0000',  # Rosso brillante
             linewidth=2,
             linestyle='-',
             alpha=0.8,
-            zorder=10  # Sopra la forma d'onda
+            zorder=10,  # Sopra la forma d'onda
+            animated=True,
+            visible=False
         )
         
-        # Aggiorna solo la linea senza ridisegnare tutto
-        self.waveform_canvas.draw_idle()
+        self.waveform_canvas.draw()
+    
+    def _on_waveform_draw(self, event):
+        """Salva lo sfondo del grafico (senza playhead) dopo ogni ridisegno completo"""
+        self.waveform_background = self.waveform_canvas.copy_from_bbox(self.waveform_ax.bbox)
+        if self.waveform_position_line is not None:
+            self.waveform_ax.draw_artist(self.waveform_position_line)
+    
+    def _update_waveform_position(self, position_seconds: Optional[float]):
+        """Aggiorna la linea di posizione sul waveform (None = nascondi)
+        
+        Ripristina lo sfondo salvato e ridisegna solo la linea: il resto della figura
+        non viene renderizzato di nuovo.
+        """
+        line = self.waveform_position_line
+        if not MATPLOTLIB_AVAILABLE or line is None or self.waveform_background is None:
+            return
+        
+        if position_seconds is None:
+            if not line.get_visible():
+                return
+            line.set_visible(False)
+        else:
+            line.set_xdata([position_seconds, position_seconds])
+            line.set_visible(True)
         
+        self.waveform_canvas.restore_region(self.waveform_background)
+        self.waveform_ax.draw_artist(line)
+        self.waveform_canvas.blit(self.waveform_ax.bbox)
+    
     def _setup_keyboard_shortcuts(self):
         """Configura le scorciatoie da tastiera"""
         self.root.bind('<space>', lambda e: self._toggle_play())
@@ -472,12 +553,9 @@ class AudioManagerGUI:
         """Gestisce la pressione di un hotkey - SEMPRE su canale principale"""
         track = self.playlist_manager.get_track_by_hotkey(key)
         if track:
-            # Ferma eventuale riproduzione corrente
-            self._stop()
-            
-            # Carica la traccia
-            self.playlist_manager.set_current_track(track.index)
-            if self._load_current_track():
+            # Carica la traccia su una nuova voce: il cue in corso continua a suonare sotto
+            self.playlist_manager.set_current_track(self.playlist_manager.index_of(track))
+            if self._load_current_track(layer=True):
                 # SEMPRE play main per hotkeys
                 self._play_main()
                 self._set_status(f"Hotkey {key}: {track.title} → MAIN")
@@ -566,7 +644,7 @@ class AudioManagerGUI:
         # Aggiorna anche la traccia corrente
         track = self.playlist_manager.get_current_track()
         if track:
-            self.playlist_manager.update_track_loop(track.index, loop_enabled)
+            self.playlist_manager.update_track_loop(self.playlist_manager.current_index, loop_enabled)
             self._update_track_list()
         
         status = "attivato" if loop_enabled else "disattivato"
@@ -587,8 +665,10 @@ class AudioManagerGUI:
         )
         
         if filepaths:
-            tracks = self.playlist_manager.add_tracks(list(filepaths))
+            tracks = self.playlist_manager.add_tracks(list(filepaths), self._on_track_probed)
+            self._watch_workers(len(tracks))
             self._update_track_list()
+            self._warm_audio_cache()
             self._set_status(f"Aggiunte {len(tracks)} tracce")
             
     def _remove_track(self):
@@ -602,7 +682,6 @@ class AudioManagerGUI:
         
         if self.playlist_manager.remove_track(index):
             self._update_track_list()
-            self._rebuild_hotkey_map()
             self._set_status("Traccia rimossa")
             
     def _move_track_up(self):
@@ -653,7 +732,6 @@ class AudioManagerGUI:
         if messagebox.askyesno("Conferma", "Vuoi invertire completamente l'ordine delle tracce?"):
             self.playlist_manager.reverse_tracks()
             self._update_track_list()
-            self._rebuild_hotkey_map()
             self._set_status("Playlist invertita")
             
     def _edit_track_notes(self):
@@ -717,6 +795,8 @@ class AudioManagerGUI:
                                             maxvalue=100)
             if volume is not None:
                 self.playlist_manager.update_track_volume(index, volume)
+                if index == self.playlist_manager.current_index:
+                    self.audio_manager.set_voice_gain(volume / 100.0)
                 self._update_track_list()
                 self._set_status(f"Volume impostato a {volume}% per: {track.title}")
     
@@ -794,6 +874,125 @@ class AudioManagerGUI:
             button_frame.pack(pady=(10, 0))
             ttk.Button(button_frame, text="Salva", command=save_trim).pack(side=tk.LEFT, padx=5)
             ttk.Button(button_frame, text="Annulla", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+    
+    def _edit_track_fades(self):
+        """Modifica le dissolvenze della traccia selezionata"""
+        selection = self.track_tree.selection()
+        if not selection:
+            messagebox.showinfo("Info", "Seleziona una traccia")
+            return
+            
+        item = self.track_tree.item(selection[0])
+        index = int(item['values'][0]) - 1
+        track = self.playlist_manager.get_track(index)
+        
+        if track:
+            dialog = tk.Toplevel(self.root)
+            dialog.title(f"Dissolvenze: {track.title}")
+            dialog.geometry("400x220")
+            dialog.configure(bg=self.colors['bg'])
+            dialog.transient(self.root)
+            dialog.grab_set()
+            
+            main_frame = ttk.Frame(dialog, padding=20)
+            main_frame.pack(fill=tk.BOTH, expand=True)
+            
+            fade_vars = {}
+            for field, label in (('fade_in', "Entrata (secondi):"),
+                                 ('fade_out', "Uscita (secondi):"),
+                                 ('crossfade', "Incrociata (secondi):")):
+                row = ttk.Frame(main_frame)
+                row.pack(fill=tk.X, pady=5)
+                ttk.Label(row, text=label, width=20).pack(side=tk.LEFT, padx=(0, 10))
+                fade_vars[field] = tk.DoubleVar(value=getattr(track, field))
+                ttk.Spinbox(row, from_=0, to=60, textvariable=fade_vars[field],
+                            width=10, increment=0.1).pack(side=tk.LEFT)
+            
+            ttk.Label(main_frame, text="(incrociata: usata quando la traccia subentra a un cue in corso)",
+                     foreground=self.colors['fg_dim']).pack(pady=(5, 10))
+            
+            def save_fades():
+                try:
+                    values = {field: var.get() for field, var in fade_vars.items()}
+                except tk.TclError:
+                    messagebox.showerror("Errore", "Inserisci valori numerici")
+                    return
+                if any(value < 0 for value in values.values()):
+                    messagebox.showerror("Errore", "Le durate devono essere >= 0")
+                    return
+                
+                self.playlist_manager.update_track_fades(index, values['fade_in'], values['fade_out'],
+                                                         values['crossfade'])
+                if index == self.playlist_manager.current_index:
+                    self.audio_manager.set_fades(values['fade_in'], values['fade_out'])
+                self._set_status(f"Dissolvenze impostate per: {track.title}")
+                dialog.destroy()
+            
+            button_frame = ttk.Frame(main_frame)
+            button_frame.pack(pady=(10, 0))
+            ttk.Button(button_frame, text="Salva", command=save_fades).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame, text="Annulla", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+    
+    def _edit_track_continue(self):
+        """Modifica l'avvio automatico della traccia successiva (auto-follow / auto-continue)"""
+        selection = self.track_tree.selection()
+        if not selection:
+            messagebox.showinfo("Info", "Seleziona una traccia")
+            return
+            
+        item = self.track_tree.item(selection[0])
+        index = int(item['values'][0]) - 1
+        track = self.playlist_manager.get_track(index)
+        
+        if track:
+            dialog = tk.Toplevel(self.root)
+            dialog.title(f"Avvio Automatico: {track.title}")
+            dialog.geometry("420x200")
+            dialog.configure(bg=self.colors['bg'])
+            dialog.transient(self.root)
+            dialog.grab_set()
+            
+            main_frame = ttk.Frame(dialog, padding=20)
+            main_frame.pack(fill=tk.BOTH, expand=True)
+            
+            # Modalità: come parte la traccia successiva
+            modes = {"": "Manuale (GO)", "follow": "Alla fine di questa traccia",
+                     "continue": "Insieme a questa traccia"}
+            mode_frame = ttk.Frame(main_frame)
+            mode_frame.pack(fill=tk.X, pady=5)
+            ttk.Label(mode_frame, text="Traccia successiva:").pack(side=tk.LEFT, padx=(0, 10))
+            mode_var = tk.StringVar(value=modes.get(track.continue_mode, modes[""]))
+            ttk.Combobox(mode_frame, textvariable=mode_var, values=list(modes.values()),
+                         state='readonly', width=26).pack(side=tk.LEFT)
+            
+            # Pre-wait: attesa prima che QUESTA traccia parta in automatico
+            wait_frame = ttk.Frame(main_frame)
+            wait_frame.pack(fill=tk.X, pady=5)
+            ttk.Label(wait_frame, text="Attesa prima dell'avvio (s):").pack(side=tk.LEFT, padx=(0, 10))
+            wait_var = tk.DoubleVar(value=track.pre_wait)
+            ttk.Spinbox(wait_frame, from_=0, to=600, textvariable=wait_var,
+                        width=10, increment=0.1).pack(side=tk.LEFT)
+            
+            def save_continue():
+                try:
+                    pre_wait = wait_var.get()
+                except tk.TclError:
+                    messagebox.showerror("Errore", "Inserisci un valore numerico")
+                    return
+                if pre_wait < 0:
+                    messagebox.showerror("Errore", "L'attesa deve essere >= 0")
+                    return
+                
+                mode = next(key for key, label in modes.items() if label == mode_var.get())
+                self.playlist_manager.update_track_continue(index, mode, pre_wait)
+                self._update_track_list()
+                self._set_status(f"Avvio automatico impostato per: {track.title}")
+                dialog.destroy()
+            
+            button_frame = ttk.Frame(main_frame)
+            button_frame.pack(pady=(10, 0))
+            ttk.Button(button_frame, text="Salva", command=save_continue).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame, text="Annulla", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
                 
     def _edit_track_hotkey(self):
         """Modifica l'hotkey della traccia selezionata"""
@@ -815,10 +1014,12 @@ class AudioManagerGUI:
                 # Valida hotkey
                 valid_keys = [str(i) for i in range(1, 10)] + [f'F{i}' for i in range(1, 13)]
                 if hotkey == "" or hotkey in valid_keys:
-                    self.playlist_manager.update_track_hotkey(index, hotkey)
-                    self._rebuild_hotkey_map()
+                    previous = self.playlist_manager.update_track_hotkey(index, hotkey)
                     self._update_track_list()
-                    self._set_status(f"Hotkey '{hotkey}' assegnata a: {track.title}")
+                    if previous is not None:
+                        self._set_status(f"Hotkey '{hotkey}' spostata da {previous.title} a: {track.title}")
+                    else:
+                        self._set_status(f"Hotkey '{hotkey}' assegnata a: {track.title}")
                 else:
                     messagebox.showerror("Errore", "Hotkey non valida. Usa 1-9 o F1-F12")
     
@@ -838,55 +1039,171 @@ class AudioManagerGUI:
                 hotkey = f"F{i+1}"
                 self.playlist_manager.update_track_hotkey(i, hotkey)
             
-            self._rebuild_hotkey_map()
             self._update_track_list()
             self._set_status(f"Hotkeys F1-F{num_tracks} assegnate automaticamente")
                     
-    def _rebuild_hotkey_map(self):
-        """Ricostruisce la mappa degli hotkey"""
-        self.hotkey_map = {}
-        for track in self.playlist_manager.tracks:
-            if track.hotkey:
-                self.hotkey_map[track.hotkey] = track.index
-            
+    def _probe_durations(self):
+        """Legge in background le durate mancanti dalle intestazioni dei file"""
+        count = self.playlist_manager.probe_tracks(self.playlist_manager.tracks,
+                                                   self._on_track_probed)
+        self._watch_workers(count)
+    
+    def _on_track_probed(self, track, info):
+        """Risultato di una lettura (thread del pool): applicato dal thread della GUI"""
+        self.worker_results.put(('probe', (track, info)))
+    
+    def _watch_workers(self, count: int):
+        """Registra count lavori in background appena avviati (chiamare dal thread della GUI)"""
+        was_idle = self.worker_jobs == 0
+        self.worker_jobs += count
+        if was_idle and count:
+            self.root.after(50, self._pump_worker_results)
+    
+    def _pump_worker_results(self):
+        """Applica alla UI i risultati dei thread di lavoro, nel thread di Tk
+        
+        Gira ogni 50 ms solo finché ci sono lavori in corso.
+        """
+        results = []
+        try:
+            while True:
+                results.append(self.worker_results.get_nowait())
+        except queue.Empty:
+            pass
+        
+        self.worker_jobs = max(0, self.worker_jobs - len(results))
+        probed = []
+        for kind, data in results:
+            if kind == 'probe':
+                probed.append(data)
+            elif kind == 'peaks':
+                filepath, pyramid = data
+                if pyramid is not None:
+                    self._draw_waveform_peaks(filepath, pyramid)
+            elif kind == 'standby':
+                self._on_standby_armed(*data)
+        # Un'unica modifica per tutte le durate: un solo snapshot e una sola riga di journal
+        if probed and self.playlist_manager.apply_durations(probed):
+            self._update_track_list()
+        
+        if self.worker_jobs and self.running:
+            self.root.after(50, self._pump_worker_results)
+    
+    def _warm_audio_cache(self):
+        """Pre-decodifica in background le tracce della playlist, a partire dalla corrente"""
+        tracks = self.playlist_manager.tracks
+        start = max(0, self.playlist_manager.current_index)
+        filepaths = [track.filepath for track in tracks[start:] + tracks[:start]]
+        self.audio_manager.warm_cache(filepaths)
+                    
     def _update_track_list(self):
-        """Aggiorna la visualizzazione della playlist"""
-        # Pulisci la lista
-        for item in self.track_tree.get_children():
-            self.track_tree.delete(item)
-            
-        # Aggiungi le tracce
-        for track in self.playlist_manager.tracks:
-            duration_str = self._format_time(track.duration) if track.duration > 0 else "--:--"
-            
-            # Formatta trim
-            if track.start_time > 0 or track.end_time > 0:
-                start_str = self._format_time(track.start_time)
-                end_str = self._format_time(track.end_time) if track.end_time > 0 else "fine"
-                trim_str = f"{start_str}-{end_str}"
+        """Aggiorna la visualizzazione della playlist toccando solo le righe cambiate"""
+        tracks = self.playlist_manager.tracks
+        current = {track.uid: track for track in tracks}
+        
+        # Rimuovi le righe delle tracce non più presenti
+        rows = {}
+        for key, row in self.track_rows.items():
+            if current.get(key) is row[0]:
+                rows[key] = row
+            else:
+                self.track_tree.delete(row[1])
+        
+        # Le righe che mantengono l'ordine relativo restano ferme, le altre vengono staccate...
+        order = {iid: i for i, iid in enumerate(self.track_tree.get_children())}
+        children = sorted(rows.values(), key=lambda row: order[row[1]])
+        stable = self._stable_rows([self.playlist_manager.index_of(row[0]) for row in children])
+        for i, row in enumerate(children):
+            if i not in stable:
+                self.track_tree.detach(row[1])
+        moved = {children[i][1] for i in range(len(children)) if i not in stable}
+        
+        # ...e reinserite nella posizione giusta insieme alle tracce nuove
+        for position, track in enumerate(tracks):
+            values = self._track_row_values(track, position)
+            tags = (self._color_tag(track.color),) if track.color else ()
+            
+            row = rows.get(track.uid)
+            if row is None:
+                iid = self.track_tree.insert('', position, values=values, tags=tags)
+            else:
+                iid = row[1]
+                if row[2] != values or row[3] != tags:
+                    self.track_tree.item(iid, values=values, tags=tags)
+                if iid in moved:
+                    self.track_tree.move(iid, '', position)
+            
+            rows[track.uid] = (track, iid, values, tags)
+        
+        self.track_rows = rows
+        
+        # Durante la riproduzione il cue pre-caricato segue le modifiche (riordino, trim, ...)
+        if self.is_playing and not self.is_preview:
+            self._arm_standby()
+    
+    @staticmethod
+    def _stable_rows(targets: list) -> set:
+        """Indici della più lunga sottosequenza crescente di targets (righe da non spostare)"""
+        tails = []  # tails[k] = indice dell'ultimo elemento della migliore sequenza lunga k + 1
+        tail_values = []  # targets[tails[k]], per la ricerca binaria
+        previous = [-1] * len(targets)
+        for i, target in enumerate(targets):
+            k = bisect.bisect_left(tail_values, target)
+            if k > 0:
+                previous[i] = tails[k - 1]
+            if k == len(tails):
+                tails.append(i)
+                tail_values.append(target)
             else:
-                trim_str = ""
-            
-            loop_str = "🔁" if track.loop else ""
-            hotkey_str = track.hotkey or ""
-            volume_str = f"{track.volume}%"
-            notes_str = track.notes[:30] + "..." if len(track.notes) > 30 else track.notes
-            
-            iid = self.track_tree.insert('', tk.END, values=(
-                track.index + 1,
-                track.title,
-                duration_str,
-                trim_str,
-                loop_str,
-                hotkey_str,
-                volume_str,
-                notes_str
-            ))
-            
-            # Applica colore se presente
-            if track.color:
-                self.track_tree.tag_configure(f'color_{track.index}', background=track.color)
-                self.track_tree.item(iid, tags=(f'color_{track.index}',))
+                tails[k] = i
+                tail_values[k] = target
+        
+        stable = set()
+        i = tails[-1] if tails else -1
+        while i >= 0:
+            stable.add(i)
+            i = previous[i]
+        return stable
+    
+    def _track_row_values(self, track, position: int) -> tuple:
+        """Valori delle colonne della playlist per una traccia"""
+        duration_str = self._format_time(track.duration) if track.duration > 0 else "--:--"
+        
+        # Formatta trim
+        if track.start_time > 0 or track.end_time > 0:
+            start_str = self._format_time(track.start_time)
+            end_str = self._format_time(track.end_time) if track.end_time > 0 else "fine"
+            trim_str = f"{start_str}-{end_str}"
+        else:
+            trim_str = ""
+        
+        loop_str = "🔁" if track.loop else ""
+        if track.continue_mode == "follow":
+            loop_str += "↪"
+        elif track.continue_mode == "continue":
+            loop_str += "⇉"
+        hotkey_str = track.hotkey or ""
+        volume_str = f"{track.volume}%"
+        notes_str = track.notes[:30] + "..." if len(track.notes) > 30 else track.notes
+        
+        return (
+            position + 1,
+            track.title,
+            duration_str,
+            trim_str,
+            loop_str,
+            hotkey_str,
+            volume_str,
+            notes_str
+        )
+    
+    def _color_tag(self, color: str) -> str:
+        """Tag condiviso da tutte le righe dello stesso colore (configurato una volta sola)"""
+        tag = f"color_{color.lstrip('#').lower()}"
+        if tag not in self.color_tags:
+            self.track_tree.tag_configure(tag, background=color)
+            self.color_tags.add(tag)
+        return tag
             
     def _on_track_double_click(self, event):
         """Carica e riproduci la traccia con doppio click"""
@@ -901,54 +1218,173 @@ class AudioManagerGUI:
         if track:
             self._load_current_track()
             
-    def _load_current_track(self):
-        """Carica la traccia corrente nell'audio manager"""
+    def _load_current_track(self, layer: bool = False):
+        """Carica la traccia corrente nell'audio manager (layer=True: sopra al cue in corso)"""
         track = self.playlist_manager.get_current_track()
         if not track:
             return False
+        
+        # Cambio manuale di traccia: l'avvio automatico armato non vale più
+        self._cancel_continuation()
             
-        if self.audio_manager.load_audio_file(track.filepath):
+        if self.audio_manager.load_audio_file(track.filepath, layer=layer):
             # Aggiorna la durata
             duration = self.audio_manager.get_duration()
-            self.playlist_manager.update_track_duration(track.index, duration)
+            self.playlist_manager.update_track_duration(self.playlist_manager.current_index, duration)
             self._update_track_list()
             
             # Aggiorna loop
-            self.loop_var.set(track.loop)
             self.audio_manager.set_loop(track.loop)
             
-            # Applica trim se impostato
+            # Applica trim e dissolvenze se impostati
             self.audio_manager.set_trim(track.start_time, track.end_time)
+            self.audio_manager.set_fades(track.fade_in, track.fade_out)
             
-            # Applica il volume della traccia al canale principale
-            self.main_volume_var.set(track.volume)
-            self.audio_manager.set_main_volume(track.volume / 100.0)
-            self.main_volume_label.config(text=f"{track.volume}%")
+            # Il volume della traccia è il guadagno della sua voce (il volume generale resta invariato)
+            self.audio_manager.set_voice_gain(track.volume / 100.0)
             
-            self.current_track_label.config(text=f"🎵 {track.title}")
-            self.duration_label.config(text=self._format_time(duration))
+            self._show_current_track(track, duration)
             self._set_status(f"Caricata: {track.title}")
-            
-            # Aggiorna waveform
-            if MATPLOTLIB_AVAILABLE:
-                self._update_waveform()
-            
             return True
         else:
             messagebox.showerror("Errore", f"Impossibile caricare: {track.filepath}")
             return False
             
+    def _show_current_track(self, track, duration: float):
+        """Mostra titolo, durata, loop e forma d'onda della traccia corrente"""
+        self.loop_var.set(track.loop)
+        self.current_track_label.config(text=f"🎵 {track.title}")
+        self.duration_label.config(text=self._format_time(duration))
+        
+        # Aggiorna waveform
+        if MATPLOTLIB_AVAILABLE:
+            self._update_waveform()
+    
+    def _arm_continuation(self):
+        """Arma nell'engine la traccia che parte in automatico dopo quella corrente"""
+        if self.pending_continuation is not None or self.is_preview:
+            return
+        continuation = self.playlist_manager.get_continuation(self.playlist_manager.current_index)
+        if continuation is None:
+            return
+        
+        track = continuation.track
+        voice = self.audio_manager.schedule_cue(
+            track.filepath, track.volume / 100.0, track.start_time, track.end_time, track.loop,
+            track.fade_in, track.fade_out, continuation.pre_wait,
+            after_current=continuation.mode == "follow")
+        if voice >= 0:
+            self.pending_continuation = (voice, track)
+            self._arm_standby()
+    
+    def _arm_standby(self):
+        """Tiene il cue successivo decodificato, posizionato sul trim e armato nell'engine
+        
+        La decodifica avviene sullo standby_executor; il cue è disponibile per il GO solo quando
+        _on_standby_armed lo registra, dal thread della GUI.
+        """
+        index = self.playlist_manager.current_index
+        track = self.playlist_manager.get_track(index + 1) if index >= 0 else None
+        if track is None or (self.pending_continuation is not None
+                             and self.pending_continuation[1] is track):
+            # Nessun cue successivo, o già armato per l'avvio automatico
+            if self.standby_request is not None:
+                self.standby = None
+                self.standby_request = None
+                self.standby_executor.submit(self.audio_manager.disarm_standby)
+            return
+        
+        params = self._standby_params(track)
+        if (self.standby_request is not None and self.standby_request[0] is track
+                and self.standby_request[1] == params):
+            return
+        
+        self.standby = None
+        self.standby_request = (track, params)
+        future = self.standby_executor.submit(
+            self.audio_manager.arm_standby, track.filepath, track.volume / 100.0, track.start_time,
+            track.end_time, track.loop, track.fade_in, track.fade_out)
+        self._watch_workers(1)
+        future.add_done_callback(lambda f: self.worker_results.put(('standby', (track, params, f))))
+    
+    def _on_standby_armed(self, track, params: tuple, future):
+        """Registra il cue armato, se nel frattempo non è stato richiesto un altro"""
+        if (self.standby_request is None or self.standby_request[0] is not track
+                or self.standby_request[1] != params):
+            return
+        voice = future.result() if future.exception() is None else -1
+        self.standby = (voice, track, params) if voice >= 0 else None
+    
+    @staticmethod
+    def _standby_params(track) -> tuple:
+        """Parametri con cui un cue è stato armato (se cambiano va riarmato)"""
+        return (track.filepath, track.volume, track.start_time, track.end_time, track.loop,
+                track.fade_in, track.fade_out)
+    
+    def _go_preroll(self, track) -> bool:
+        """Avvia il cue pre-caricato al posto di quello in corso, nello stesso ciclo audio"""
+        if (self.standby is not None and self.standby[1] is track
+                and self.standby[2] == self._standby_params(track)):
+            voice = self.standby[0]
+        elif self.pending_continuation is not None and self.pending_continuation[1] is track:
+            voice = self.pending_continuation[0]
+        else:
+            return False
+        
+        if not self.audio_manager.go_standby(voice, track.filepath, track.crossfade):
+            return False
+        self.standby = None
+        self.standby_request = None
+        self.pending_continuation = None
+        self._adopt_current_track(track, f"▶ {track.title}")
+        return True
+    
+    def _adopt_current_track(self, track, status: str):
+        """Aggiorna la UI per un cue già partito nell'engine e arma quelli successivi"""
+        index = self.playlist_manager.index_of(track)
+        self.playlist_manager.set_current_track(index)
+        duration = self.audio_manager.get_duration()
+        self.playlist_manager.update_track_duration(index, duration)
+        self._show_current_track(track, duration)
+        self._set_status(status)
+        
+        # Catena di avvii automatici e pre-caricamento del cue successivo
+        self._arm_continuation()
+        self._arm_standby()
+        self._update_track_list()
+    
+    def _cancel_continuation(self):
+        """Annulla l'avvio automatico armato"""
+        if self.pending_continuation is not None:
+            voice, _ = self.pending_continuation
+            self.pending_continuation = None
+            self.audio_manager.stop_voice(voice)
+    
+    def _on_continuation_started(self):
+        """La traccia armata è partita: diventa la traccia corrente"""
+        voice, track = self.pending_continuation
+        self.pending_continuation = None
+        self.audio_manager.promote_voice(voice, track.filepath)
+        self._adopt_current_track(track, f"▶ Avvio automatico: {track.title}")
+    
     def _play_main(self):
         """Riproduci sul canale principale"""
         if not self._ensure_track_loaded():
             return
-            
+        
+        # Avvio automatico armato prima del play: l'engine lo aggancia alla partenza di questo
+        # cue, così un 'continue' parte allineato al campione
+        self.is_preview = False
+        self._arm_continuation()
         if self.audio_manager.play_main():
             self.is_playing = True
-            self.is_preview = False
+            self._wake_event_pump()
+            self._arm_standby()
             self.play_btn.config(state=tk.DISABLED)
             self.preview_btn.config(state=tk.DISABLED)
             self._set_status("▶ Riproduzione su uscita PRINCIPALE")
+        else:
+            self._cancel_continuation()
             
     def _play_preview(self):
         """Riproduci sul canale preview"""
@@ -958,6 +1394,7 @@ class AudioManagerGUI:
         if self.audio_manager.play_preview():
             self.is_playing = True
             self.is_preview = True
+            self._wake_event_pump()
             self.play_btn.config(state=tk.DISABLED)
             self.preview_btn.config(state=tk.DISABLED)
             self._set_status("🎧 Riproduzione su uscita PREVIEW")
@@ -973,6 +1410,7 @@ class AudioManagerGUI:
     def _stop(self):
         """Ferma la riproduzione"""
         self.audio_manager.stop()
+        self.pending_continuation = None
         self.is_playing = False
         self.is_preview = False
         self.play_btn.config(state=tk.NORMAL)
@@ -981,14 +1419,8 @@ class AudioManagerGUI:
         self.time_label.config(text="00:00")
         self._set_status("⏹ Stop")
         
-        # Rimuovi la linea di posizione dal waveform
-        if MATPLOTLIB_AVAILABLE and self.waveform_position_line is not None:
-            try:
-                self.waveform_position_line.remove()
-                self.waveform_canvas.draw_idle()
-            except:
-                pass
-            self.waveform_position_line = None
+        # Nascondi la linea di posizione dal waveform
+        self._update_waveform_position(None)
         
     def _toggle_play(self):
         """Toggle play/pause"""
@@ -1003,6 +1435,12 @@ class AudioManagerGUI:
         if track:
             was_playing = self.is_playing
             was_preview = self.is_preview
+            if was_playing and not was_preview and self._go_preroll(track):
+                # Cue successivo già pre-caricato: nessuna pausa
+                return
+            if was_playing and track.crossfade > 0:
+                self._crossfade_to_current(track)
+                return
             self._stop()
             
             if self._load_current_track():
@@ -1020,6 +1458,9 @@ class AudioManagerGUI:
         if track:
             was_playing = self.is_playing
             was_preview = self.is_preview
+            if was_playing and track.crossfade > 0:
+                self._crossfade_to_current(track)
+                return
             self._stop()
             
             if self._load_current_track():
@@ -1029,6 +1470,21 @@ class AudioManagerGUI:
                     else:
                         self._play_main()
                         
+    def _crossfade_to_current(self, track):
+        """Avvia la traccia corrente sopra al cue in corso, sfumando quest'ultimo"""
+        if not self._load_current_track(layer=True):
+            return
+        if self.audio_manager.crossfade(track.crossfade):
+            self._set_status(f"⇄ Dissolvenza incrociata su: {track.title}")
+            self._arm_continuation()
+            return
+        
+        # Dissolvenza non avviata (es. stream non disponibile): avvio normale, senza sfumare
+        self._stop()
+        self._play_main()
+        if not self.is_playing:
+            self._set_status(f"Impossibile avviare: {track.title}")
+                
     def _ensure_track_loaded(self) -> bool:
         """Assicura che una traccia sia caricata"""
         if self.audio_manager.current_audio is not None:
@@ -1050,7 +1506,7 @@ class AudioManagerGUI:
         """Salva la playlist con configurazione audio"""
         filepath = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("Playlist JSON", "*.json"), ("Tutti i file", "*.*")]
+            filetypes=[("Playlist JSON", "*.json"), ("Show binario", "*.amshow"), ("Tutti i file", "*.*")]
         )
         
         if filepath:
@@ -1089,7 +1545,8 @@ class AudioManagerGUI:
     def _load_playlist(self):
         """Carica una playlist con configurazione audio"""
         filepath = filedialog.askopenfilename(
-            filetypes=[("Playlist JSON", "*.json"), ("Tutti i file", "*.*")]
+            filetypes=[("Playlist", "*.json *.amshow"), ("Playlist JSON", "*.json"),
+                       ("Show binario", "*.amshow"), ("Tutti i file", "*.*")]
         )
         
         if filepath:
@@ -1105,7 +1562,8 @@ class AudioManagerGUI:
             
             if success:
                 self._update_track_list()
-                self._rebuild_hotkey_map()
+                self._warm_audio_cache()
+                self._probe_durations()
                 
                 # Applica configurazione audio se presente
                 if audio_config:
@@ -1157,6 +1615,21 @@ class AudioManagerGUI:
             self.preview_volume_var.set(config['preview_volume'])
             self._on_preview_volume_changed()
                 
+    def _show_latency_report(self):
+        """Mostra la latenza negoziata con i dispositivi audio"""
+        report = self.audio_manager.get_latency_report()
+        lines = []
+        for output, label in (('main', "Principale"), ('preview', "Preview")):
+            info = report[output]
+            if not info['open']:
+                lines.append(f"{label}: stream non aperto")
+                continue
+            blocksize = info['blocksize'] or "variabile"
+            lines.append(f"{label}: {info['latency'] * 1000:.1f} ms "
+                         f"(blocco {blocksize}, {info['sample_rate']:.0f} Hz, "
+                         f"richiesta {info['requested_latency'] or 'default'})")
+        messagebox.showinfo("Latenza Audio", "\n".join(lines))
+                
     def _restore_backup(self):
         """Ripristina dall'ultimo backup"""
         playlist_path, config_path = self.auto_backup.get_latest_backup()
@@ -1168,7 +1641,8 @@ class AudioManagerGUI:
         if messagebox.askyesno("Conferma", "Ripristinare l'ultimo backup?"):
             if self.playlist_manager.load_playlist(playlist_path):
                 self._update_track_list()
-                self._rebuild_hotkey_map()
+                self._warm_audio_cache()
+                self._probe_durations()
                 self._set_status("Backup ripristinato")
             else:
                 messagebox.showerror("Errore", "Impossibile ripristinare il backup")
@@ -1183,34 +1657,70 @@ class AudioManagerGUI:
         }
         self.auto_backup.start(self.playlist_manager, config_data)
         
-    def _start_update_thread(self):
-        """Avvia il thread di aggiornamento UI"""
-        def update_loop():
-            while self.running:
-                if self.is_playing and self.audio_manager.is_playing():
-                    position = self.audio_manager.get_position()
-                    duration = self.audio_manager.get_duration()
-                    
-                    if duration > 0:
-                        progress = (position / duration) * 100
-                        self.progress_var.set(progress)
-                        self.time_label.config(text=self._format_time(position))
-                        
-                        # Aggiorna la linea di posizione sul waveform
-                        if MATPLOTLIB_AVAILABLE:
-                            self.root.after(0, lambda p=position: self._update_waveform_position(p))
-                        
-                        # Auto next track quando finisce (se non loop)
-                        if not self.audio_manager.is_loop_enabled() and position >= duration - 0.1:
-                            self.root.after(0, self._handle_track_end)
-                            
-                time.sleep(0.1)
-                
-        self.update_thread = threading.Thread(target=update_loop, daemon=True)
-        self.update_thread.start()
+    def _wake_event_pump(self):
+        """Riattiva la lettura degli eventi dell'engine (dopo play, preview, crossfade...)"""
+        if not self.event_pump_active:
+            self.audio_manager.poll_events()  # Scarta gli eventi accumulati mentre la UI era inattiva
+            self.event_pump_active = True
+            self.root.after(0, self._pump_engine_events)
+    
+    def _pump_engine_events(self):
+        """Applica alla UI gli eventi dell'engine, nel thread di Tk
+        
+        Gira a 30 fps mentre il cue corrente suona e si ferma del tutto quando non c'è nulla
+        in riproduzione: nessun thread di polling e nessuna chiamata all'engine dalla UI
+        oltre a letture senza lock.
+        """
+        if not self.running:
+            return
+        
+        output = 'Preview' if self.is_preview else 'Main'
+        position = None
+        ended = False
+        for event in self.audio_manager.poll_events():
+            if event.output != output:
+                continue
+            if event.kind == 'position':
+                position = event.position
+            elif event.kind == 'end':
+                ended = True
+            elif (event.kind == 'start' and self.pending_continuation is not None
+                  and event.voice == self.pending_continuation[0]):
+                # Partita la traccia in avvio automatico: da qui è lei il cue corrente
+                self._on_continuation_started()
+                position = None
+        
+        if ended and self.is_playing and not self.audio_manager.is_current_playing():
+            # Il cue corrente è arrivato alla fine (eventuali altre voci continuano)
+            self._handle_track_end()
+        elif position is not None and self.is_playing:
+            duration = self.audio_manager.get_duration()
+            if duration > 0:
+                self.progress_var.set((position / duration) * 100)
+                self.time_label.config(text=self._format_time(position))
+                self._update_waveform_position(position)
+        
+        if self.is_playing:
+            self.root.after(33, self._pump_engine_events)
+        else:
+            self.event_pump_active = False
         
     def _handle_track_end(self):
         """Gestisce la fine della traccia - si ferma invece di avanzare automaticamente"""
+        if not self.is_playing:
+            return
+        if (self.pending_continuation is not None
+                and self.audio_manager.is_voice_active(self.pending_continuation[0])):
+            # La traccia successiva partirà in automatico dopo la sua attesa
+            self._set_status("In attesa dell'avvio automatico...")
+            return
+        if self.audio_manager.is_playing():
+            # Altri cue sovrapposti stanno ancora suonando: non interromperli
+            self.is_playing = False
+            self.play_btn.config(state=tk.NORMAL)
+            self.preview_btn.config(state=tk.NORMAL)
+            self._set_status("Traccia terminata (altri cue ancora in riproduzione)")
+            return
         self._stop()
         self._set_status("Traccia terminata")
             
@@ -1222,42 +1732,48 @@ class AudioManagerGUI:
         
     def _set_status(self, message: str):
         """Imposta il messaggio di stato"""
-        backup_msg = " | Backup automatico attivo ogni 5 minuti"
+        backup_msg = " | Backup automatico attivo"
         self.status_label.config(text=message + backup_msg)
     
+    def _session_config(self) -> dict:
+        """Configurazione della sessione corrente (playlist, dispositivi, volumi)
+        
+        Le tracce vengono convertite dallo snapshot immutabile solo al momento della scrittura,
+        anche se questa avviene sul thread del journal.
+        """
+        # Salva i device ID invece degli indici
+        main_device_id = None
+        preview_device_id = None
+        
+        if hasattr(self, 'main_device_combo') and hasattr(self, 'audio_devices'):
+            idx = self.main_device_combo.current()
+            if idx >= 0 and idx < len(self.audio_devices):
+                main_device_id = self.audio_devices[idx]['id']
+        
+        if hasattr(self, 'preview_device_combo') and hasattr(self, 'audio_devices'):
+            idx = self.preview_device_combo.current()
+            if idx >= 0 and idx < len(self.audio_devices):
+                preview_device_id = self.audio_devices[idx]['id']
+        
+        snapshot = self.playlist_manager.snapshot()
+        return {
+            'playlist': lambda: snapshot.to_dict()['tracks'],
+            'main_device_id': main_device_id,
+            'preview_device_id': preview_device_id,
+            'main_volume': self.main_volume_var.get() if hasattr(self, 'main_volume_var') else 100,
+            'preview_volume': self.preview_volume_var.get() if hasattr(self, 'preview_volume_var') else 100,
+            'current_track_index': self.playlist_manager.current_index if self.playlist_manager.current_index >= 0 else None
+        }
+    
     def _save_last_session(self):
         """Salva la configurazione della sessione corrente"""
         try:
-            # Salva i device ID invece degli indici
-            main_device_id = None
-            preview_device_id = None
-            
-            if hasattr(self, 'main_device_combo') and hasattr(self, 'audio_devices'):
-                idx = self.main_device_combo.current()
-                if idx >= 0 and idx < len(self.audio_devices):
-                    main_device_id = self.audio_devices[idx]['id']
-                    print(f"Salvataggio main device: {self.audio_devices[idx]['name']} (ID: {main_device_id})")
-            
-            if hasattr(self, 'preview_device_combo') and hasattr(self, 'audio_devices'):
-                idx = self.preview_device_combo.current()
-                if idx >= 0 and idx < len(self.audio_devices):
-                    preview_device_id = self.audio_devices[idx]['id']
-                    print(f"Salvataggio preview device: {self.audio_devices[idx]['name']} (ID: {preview_device_id})")
-            
-            config = {
-                'playlist': self.playlist_manager.to_dict()['tracks'],
-                'main_device_id': main_device_id,
-                'preview_device_id': preview_device_id,
-                'main_volume': self.main_volume_var.get() if hasattr(self, 'main_volume_var') else 100,
-                'preview_volume': self.preview_volume_var.get() if hasattr(self, 'preview_volume_var') else 100,
-                'current_track_index': self.playlist_manager.current_index if self.playlist_manager.current_index >= 0 else None
-            }
-            
-            with open(self.last_session_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            # Scrittura atomica dello stato completo; il journal delle modifiche riparte vuoto
+            self.session_file.compact()
             
+            config = self._session_config()
             print(f"File salvato in: {self.last_session_file}")
-            print(f"Config salvata: main_device_id={main_device_id}, preview_device_id={preview_device_id}")
+            print(f"Config salvata: main_device_id={config['main_device_id']}, preview_device_id={config['preview_device_id']}")
             
             return True
         except Exception as e:
@@ -1266,6 +1782,15 @@ class AudioManagerGUI:
             traceback.print_exc()
             return False
     
+    def _attach_session_journal(self):
+        """Da qui in poi ogni modifica alla playlist viene aggiunta al journal della sessione"""
+        try:
+            self.session_file.compact()
+        except OSError as e:
+            print(f"Errore salvataggio sessione, journal disattivato: {e}")
+            return
+        self.playlist_manager.journal = self.session_file
+    
     def _load_last_session(self):
         """Carica la configurazione dell'ultima sessione"""
         if not self.last_session_file.exists():
@@ -1275,16 +1800,22 @@ class AudioManagerGUI:
         print(f"Caricamento sessione da: {self.last_session_file}")
         
         try:
-            with open(self.last_session_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config, changes = self.session_file.load()
             
             print(f"Config caricata: main_device_id={config.get('main_device_id')}, preview_device_id={config.get('preview_device_id')}")
             
-            # Ripristina playlist
-            if 'playlist' in config and config['playlist']:
-                self.playlist_manager.from_dict({'tracks': config['playlist']})
-                self._update_track_list()
-                self._rebuild_hotkey_map()
+            # Ripristina playlist e traccia corrente (senza caricarla)
+            current_index = config.get('current_track_index')
+            self.playlist_manager.from_dict({
+                'tracks': config.get('playlist') or [],
+                'current_index': current_index if current_index is not None else -1
+            })
+            
+            # Modifiche successive all'ultimo salvataggio completo (es. dopo un crash)
+            if changes:
+                applied = self.playlist_manager.apply_changes(changes)
+                print(f"Journal sessione: {applied}/{len(changes)} modifiche riapplicate")
+            self._update_track_list()
             
             # Ripristina dispositivi audio cercando per device ID
             if hasattr(self, 'audio_devices'):
@@ -1327,9 +1858,8 @@ class AudioManagerGUI:
                 self.preview_volume_var.set(config['preview_volume'])
                 self._on_preview_volume_changed()
             
-            # Ripristina traccia corrente (senza caricarla)
-            if 'current_track_index' in config and config['current_track_index'] is not None:
-                self.playlist_manager.current_index = config['current_track_index']
+            self._warm_audio_cache()
+            self._probe_durations()
             
             self._set_status("Ultima sessione ripristinata")
             return True
@@ -1343,13 +1873,18 @@ class AudioManagerGUI:
         # Salva la sessione corrente
         if self._save_last_session():
             print("✓ Sessione salvata con successo (playlist + dispositivi audio)")
+        self.playlist_manager.journal = None
+        self.session_file.close()
         
         # Crea backup finale
         self.auto_backup.create_backup()
         
         self.running = False
+        self.standby_executor.shutdown(wait=False)
+        self.playlist_manager.probe.shutdown()
         self.auto_backup.stop()
         self._stop()
+        self.audio_manager.close()
         self.root.destroy()
 
 
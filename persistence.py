@@ -0,0 +1,226 @@
+"""
+Persistence Module
+Scritture atomiche su disco e journal append-only delle modifiche alla playlist
+"""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+
+def atomic_write_bytes(path, data: bytes):
+    """Scrive il file in modo atomico: file temporaneo nella stessa cartella, fsync e rename
+
+    Un crash durante la scrittura lascia intatta la versione precedente del file.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        # mkstemp crea il file leggibile solo dal proprietario: mantieni i permessi abituali
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def atomic_write_json(path, data, indent: Optional[int] = None):
+    """Serializza data in JSON e lo scrive in modo atomico"""
+    separators = None if indent is not None else (',', ':')
+    text = json.dumps(data, indent=indent, separators=separators, ensure_ascii=False)
+    atomic_write_bytes(path, text.encode('utf-8'))
+
+
+def _fsync_directory(directory: Path):
+    """Rende persistente il rename (su Windows le directory non si possono aprire)"""
+    if os.name != 'posix':
+        return
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JournaledFile:
+    """File JSON di base più un journal append-only delle modifiche successive
+
+    Ogni modifica costa una riga nel journal; ogni compact_every modifiche lo stato completo
+    (fornito da snapshot) viene riscritto in modo atomico e il journal svuotato. Il file di base
+    contiene la generazione del journal: le righe di una generazione precedente (crash tra la
+    scrittura della base e lo svuotamento del journal) vengono ignorate.
+
+    record() si limita ad accodare: scritture, fsync e compattazioni avvengono su un thread
+    dedicato, con un solo fsync per tutte le righe accodate nel frattempo. Le modifiche accodate
+    non devono più essere modificate. snapshot viene chiamata dal thread che registra la modifica
+    e deve essere economica: i valori chiamabili del dizionario vengono calcolati dal thread di
+    scrittura.
+    """
+
+    GENERATION_KEY = 'journal_generation'
+
+    def __init__(self, path, snapshot: Callable[[], dict], compact_every: int = 500):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix('.journal')
+        self.snapshot = snapshot  # Funzione che ritorna lo stato completo da salvare
+        self.compact_every = compact_every
+        self.generation = 0  # Generazione della base su disco (e delle righe scritte)
+        self.entries = 0  # Modifiche registrate dall'ultima compattazione
+        self.journal_file = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)  # Nuove righe accodate o scritture finite
+        self.pending = []  # Modifiche (dict) e compattazioni (stato, tuple) da scrivere
+        self.busy = False  # Il thread di scrittura sta scrivendo un gruppo di elementi
+        self.writer = None
+
+    def load(self) -> Tuple[Optional[dict], List[dict]]:
+        """Legge (base, modifiche da riapplicare); base è None se il file non esiste"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None, []
+
+        generation = data.pop(self.GENERATION_KEY, 0)
+        changes = []
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        break  # Ultima riga troncata da un crash: le precedenti sono valide
+                    if change.pop('g', None) == generation:
+                        changes.append(change)
+        except FileNotFoundError:
+            pass
+
+        with self.lock:
+            self.generation = generation
+            self.entries = len(changes)
+        return data, changes
+
+    def record(self, change: dict):
+        """Accoda una modifica al journal (e una compattazione se è diventato lungo)"""
+        with self.lock:
+            self.pending.append(change)
+            self.entries += 1
+            if self.entries >= self.compact_every:
+                self.entries = 0
+                self.pending.append((self.snapshot(),))
+            self._start_writer()
+            self.changed.notify_all()
+
+    def compact(self):
+        """Riscrive subito lo stato completo in modo atomico e svuota il journal"""
+        with self.lock:
+            self._wait_idle()
+            # Il thread di scrittura è fermo e non può riprendere finché il lock è acquisito
+            self.entries = 0
+            self._write_base(self.snapshot())
+
+    def flush(self):
+        """Attende che le modifiche accodate siano su disco"""
+        with self.lock:
+            self._wait_idle()
+
+    def close(self):
+        """Scrive le modifiche accodate e chiude il journal (senza compattare)"""
+        with self.lock:
+            self._wait_idle()
+            writer, self.writer = self.writer, None
+            self.changed.notify_all()
+        if writer is not None:
+            writer.join()
+        with self.lock:
+            if self.journal_file is not None:
+                self.journal_file.close()
+                self.journal_file = None
+
+    def _wait_idle(self):
+        """Attende che il thread di scrittura abbia finito (chiamare con il lock acquisito)"""
+        while self.pending or self.busy:
+            self.changed.wait()
+
+    def _start_writer(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+    def _write_loop(self):
+        """Scrive in gruppo le righe accodate (un solo fsync) e le compattazioni, in ordine"""
+        me = threading.current_thread()
+        while True:
+            with self.lock:
+                while not self.pending and self.writer is me:
+                    self.changed.wait()
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, []
+                self.busy = True
+
+            lines = []
+            for item in batch:
+                if isinstance(item, dict):
+                    # La generazione è quella della base già scritta, anche se una compattazione fallisce
+                    lines.append(json.dumps(dict(item, g=self.generation), separators=(',', ':'),
+                                            ensure_ascii=False))
+                    continue
+                self._write_lines(lines)
+                lines = []
+                try:
+                    self._write_base(*item)
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"Errore compattazione {self.path}: {e}")
+            self._write_lines(lines)
+
+            with self.lock:
+                self.busy = False
+                self.changed.notify_all()
+
+    def _write_lines(self, lines: List[str]):
+        """Aggiunge le righe al journal con un solo fsync"""
+        if not lines:
+            return
+        try:
+            if self.journal_file is None:
+                self.journal_file = open(self.journal_path, 'a', encoding='utf-8')
+            self.journal_file.write(''.join(line + '\n' for line in lines))
+            self.journal_file.flush()
+            os.fsync(self.journal_file.fileno())
+        except OSError as e:
+            # Le modifiche in memoria restano valide: verranno salvate alla prossima compattazione
+            print(f"Errore scrittura journal {self.journal_path}: {e}")
+
+    def _write_base(self, state: dict):
+        """Scrive la base della generazione successiva e svuota il journal"""
+        data = {key: value() if callable(value) else value for key, value in state.items()}
+        data[self.GENERATION_KEY] = self.generation + 1
+        atomic_write_json(self.path, data, indent=2)
+        self.generation += 1
+
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
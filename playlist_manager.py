@@ -3,34 +3,167 @@ Playlist Manager Module
 Gestisce la lista di tracce audio, l'ordine e il caricamento
 """
 
+import itertools
 import json
 import os
-from typing import List, Optional
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from dataclasses import dataclass
 from pathlib import Path
 
+from audio_probe import AudioInfo, AudioProbe
+from persistence import atomic_write_json
+from show_format import SHOW_EXTENSION, ShowFile, is_show_file, write_show
+
+
+# Identificativi univoci delle tracce per la durata della sessione
+_track_uids = itertools.count(1)
+
 
-@dataclass
 class AudioTrack:
-    """Rappresenta una singola traccia audio"""
-    filepath: str
-    title: str
-    duration: float = 0.0
-    index: int = 0
-    notes: str = ""  # Note/marker per identificare la scena
-    color: str = ""  # Colore per categorizzazione (hex: #RRGGBB)
-    loop: bool = False  # Se true, la traccia si ripete in loop
-    hotkey: str = ""  # Tasto rapido (1-9, F1-F12, etc)
-    volume: int = 100  # Volume personalizzato per questa traccia (0-100)
-    start_time: float = 0.0  # Tempo di inizio in secondi (per trim)
-    end_time: float = 0.0  # Tempo di fine in secondi (0 = fine naturale del file)
+    """Rappresenta una singola traccia audio
+    
+    Classe con __slots__ (niente __dict__ per istanza) e (de)serializzazione scritta a mano:
+    gli archivi contengono decine di migliaia di cue.
+    """
+    
+    __slots__ = ('filepath', 'title', 'duration', 'notes', 'color', 'loop', 'hotkey', 'volume',
+                 'start_time', 'end_time', 'fade_in', 'fade_out', 'crossfade', 'continue_mode',
+                 'pre_wait', 'uid')
+    
+    def __init__(self, filepath: str, title: str, duration: float = 0.0, notes: str = "",
+                 color: str = "", loop: bool = False, hotkey: str = "", volume: int = 100,
+                 start_time: float = 0.0, end_time: float = 0.0, fade_in: float = 0.0,
+                 fade_out: float = 0.0, crossfade: float = 0.0, continue_mode: str = "",
+                 pre_wait: float = 0.0, uid: Optional[int] = None):
+        self.filepath = filepath
+        self.title = title
+        self.duration = duration
+        self.notes = notes  # Note/marker per identificare la scena
+        self.color = color  # Colore per categorizzazione (hex: #RRGGBB)
+        self.loop = loop  # Se true, la traccia si ripete in loop
+        self.hotkey = hotkey  # Tasto rapido (1-9, F1-F12, etc)
+        self.volume = volume  # Volume personalizzato per questa traccia (0-100)
+        self.start_time = start_time  # Tempo di inizio in secondi (per trim)
+        self.end_time = end_time  # Tempo di fine in secondi (0 = fine naturale del file)
+        self.fade_in = fade_in  # Dissolvenza in entrata in secondi
+        self.fade_out = fade_out  # Dissolvenza in uscita (prima della fine) in secondi
+        self.crossfade = crossfade  # Dissolvenza incrociata quando subentra a un cue in corso (0 = taglio netto)
+        self.continue_mode = continue_mode  # Avvio automatico della traccia successiva: "follow" (alla fine), "continue" (insieme)
+        self.pre_wait = pre_wait  # Attesa in secondi prima che questa traccia parta in automatico
+        # Identità stabile (non salvata): la posizione nella playlist la conosce solo PlaylistManager
+        self.uid = next(_track_uids) if uid is None else uid
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _TRACK_FIELDS)
+        return f"AudioTrack({fields})"
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    __hash__ = None  # Mutabile, come la dataclass precedente
+    
+    def to_record(self) -> 'TrackRecord':
+        """Copia immutabile dei campi salvati"""
+        return TrackRecord(self.filepath, self.title, self.duration, self.notes, self.color,
+                           self.loop, self.hotkey, self.volume, self.start_time, self.end_time,
+                           self.fade_in, self.fade_out, self.crossfade, self.continue_mode,
+                           self.pre_wait)
     
     def to_dict(self):
-        return asdict(self)
+        return {
+            'filepath': self.filepath,
+            'title': self.title,
+            'duration': self.duration,
+            'notes': self.notes,
+            'color': self.color,
+            'loop': self.loop,
+            'hotkey': self.hotkey,
+            'volume': self.volume,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'fade_in': self.fade_in,
+            'fade_out': self.fade_out,
+            'crossfade': self.crossfade,
+            'continue_mode': self.continue_mode,
+            'pre_wait': self.pre_wait,
+        }
     
     @staticmethod
     def from_dict(data: dict):
-        return AudioTrack(**data)
+        # Le chiavi sconosciute (es. 'index' delle versioni precedenti) vengono ignorate;
+        # uid viene sempre riassegnato
+        get = data.get
+        return AudioTrack(
+            data['filepath'],
+            data['title'],
+            get('duration', 0.0),
+            get('notes', ""),
+            get('color', ""),
+            get('loop', False),
+            get('hotkey', ""),
+            get('volume', 100),
+            get('start_time', 0.0),
+            get('end_time', 0.0),
+            get('fade_in', 0.0),
+            get('fade_out', 0.0),
+            get('crossfade', 0.0),
+            get('continue_mode', ""),
+            get('pre_wait', 0.0),
+        )
+
+
+# Campi salvati nel JSON, nell'ordine del costruttore
+_TRACK_FIELDS = AudioTrack.__slots__[:-1]
+
+
+class TrackRecord(NamedTuple):
+    """Valori di una traccia in un istante, non modificabili (vedi PlaylistManager.snapshot)"""
+    filepath: str
+    title: str
+    duration: float
+    notes: str
+    color: str
+    loop: bool
+    hotkey: str
+    volume: int
+    start_time: float
+    end_time: float
+    fade_in: float
+    fade_out: float
+    crossfade: float
+    continue_mode: str
+    pre_wait: float
+    
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+@dataclass(frozen=True)
+class PlaylistSnapshot:
+    """Stato della playlist dopo una modifica completa, leggibile da qualsiasi thread"""
+    revision: int
+    tracks: Tuple[TrackRecord, ...]
+    current_index: int
+    
+    def to_dict(self) -> dict:
+        """Stesso formato di PlaylistManager.to_dict"""
+        return {
+            'tracks': [record.to_dict() for record in self.tracks],
+            'current_index': self.current_index
+        }
+
+
+CONTINUE_MODES = ("", "follow", "continue")
+
+
+@dataclass(frozen=True)
+class CueContinuation:
+    """Traccia da avviare in automatico dopo quella corrente"""
+    track: AudioTrack
+    mode: str  # "follow": alla fine della corrente, "continue": insieme alla corrente
+    pre_wait: float  # Secondi di attesa dopo la fine (follow) o l'inizio (continue)
 
 
 class PlaylistManager:
@@ -39,7 +172,17 @@ class PlaylistManager:
     def __init__(self):
         self.tracks: List[AudioTrack] = []
         self.current_index: int = -1
+        self._positions: Optional[Dict[int, int]] = None  # uid -> posizione, ricostruita solo quando serve
         self.playlist_file: Optional[str] = None
+        self.hotkeys: Dict[str, AudioTrack] = {}  # Hotkey -> traccia (ogni hotkey al massimo su una traccia)
+        self.probe = AudioProbe()  # Lettura in background delle durate dalle intestazioni
+        self.journal = None  # Oggetto con record(change) che riceve ogni modifica (es. JournaledFile)
+        self.revision = 0  # Contatore delle modifiche: chi salva confronta il valore già salvato
+        # Copia immutabile di ogni traccia, nello stesso ordine di tracks: a ogni modifica viene
+        # rifatto solo il record della traccia cambiata e la tupla dei riferimenti
+        self._records: List[TrackRecord] = []
+        self._snapshot = PlaylistSnapshot(0, (), -1)
+        self._replaying = False  # Durante apply_changes lo snapshot viene pubblicato una volta alla fine
         
     def add_track(self, filepath: str, title: Optional[str] = None) -> AudioTrack:
         """Aggiunge una traccia alla playlist"""
@@ -53,16 +196,23 @@ class PlaylistManager:
         # Calcola la durata (verrà aggiornata quando caricata)
         track = AudioTrack(
             filepath=filepath,
-            title=title,
-            index=len(self.tracks)
+            title=title
         )
         
         self.tracks.append(track)
-        self._update_indices()
+        self._records.append(track.to_record())
+        if self._positions is not None:
+            self._positions[track.uid] = len(self.tracks) - 1
+        self._record('add', track=track.to_dict())
         return track
         
-    def add_tracks(self, filepaths: List[str]) -> List[AudioTrack]:
-        """Aggiunge multiple tracce alla playlist"""
+    def add_tracks(self, filepaths: List[str],
+                   on_probed: Optional[Callable[[AudioTrack, Optional[AudioInfo]], None]] = None
+                   ) -> List[AudioTrack]:
+        """Aggiunge multiple tracce alla playlist
+        
+        Le durate vengono lette in background dalle intestazioni (vedi probe_tracks).
+        """
         added_tracks = []
         for filepath in filepaths:
             try:
@@ -70,13 +220,58 @@ class PlaylistManager:
                 added_tracks.append(track)
             except Exception as e:
                 print(f"Errore aggiunta traccia {filepath}: {e}")
+        self.probe_tracks(added_tracks, on_probed)
         return added_tracks
+    
+    def probe_tracks(self, tracks: List[AudioTrack],
+                     on_probed: Optional[Callable[[AudioTrack, Optional[AudioInfo]], None]] = None) -> int:
+        """Legge in parallelo le intestazioni delle tracce senza durata
+        
+        on_probed(track, info) viene chiamato da un thread del pool a lettura conclusa, una volta
+        per ogni traccia senza durata (info None se il file non è leggibile); le tracce non vengono
+        modificate: i risultati vanno applicati con apply_durations. Ritorna quante sono.
+        """
+        if on_probed is None:
+            return 0
+        pending = {}  # filepath -> tracce in attesa (lo stesso file può comparire più volte)
+        for track in tracks:
+            if track.duration <= 0:
+                pending.setdefault(track.filepath, []).append(track)
+        
+        def notify(filepath: str, info: Optional[AudioInfo]):
+            for track in pending.get(filepath, []):
+                on_probed(track, info)
+        
+        count = sum(len(waiting) for waiting in pending.values())
+        if pending:
+            self.probe.probe_many(list(pending), notify)
+        return count
+    
+    def apply_durations(self, results: List[Tuple[AudioTrack, Optional[AudioInfo]]]) -> int:
+        """Imposta in un'unica modifica le durate lette da probe_tracks; ritorna quante sono cambiate
+        
+        Le tracce rimosse nel frattempo o che hanno già una durata vengono saltate.
+        """
+        durations = []  # [indice, durata]
+        for track, info in results:
+            index = self.index_of(track)
+            if info is None or index < 0 or track.duration > 0 or info.duration <= 0:
+                continue
+            track.duration = info.duration
+            self._records[index] = track.to_record()
+            durations.append([index, info.duration])
+        if durations:
+            self._record('durations', durations=durations)
+        return len(durations)
         
     def remove_track(self, index: int) -> bool:
         """Rimuove una traccia dalla playlist"""
         if 0 <= index < len(self.tracks):
-            self.tracks.pop(index)
-            self._update_indices()
+            track = self.tracks.pop(index)
+            self._records.pop(index)
+            if self.hotkeys.get(track.hotkey) is track:
+                del self.hotkeys[track.hotkey]
+            self._positions = None
             
             # Aggiusta l'indice corrente se necessario
             if self.current_index >= len(self.tracks):
@@ -84,6 +279,7 @@ class PlaylistManager:
             elif self.current_index > index:
                 self.current_index -= 1
                 
+            self._record('remove', index=index)
             return True
         return False
         
@@ -94,7 +290,11 @@ class PlaylistManager:
             
         track = self.tracks.pop(from_index)
         self.tracks.insert(to_index, track)
-        self._update_indices()
+        self._records.insert(to_index, self._records.pop(from_index))
+        if self._positions is not None:
+            # Cambiano posizione solo le tracce tra le due posizioni
+            for i in range(min(from_index, to_index), max(from_index, to_index) + 1):
+                self._positions[self.tracks[i].uid] = i
         
         # Aggiusta l'indice corrente
         if self.current_index == from_index:
@@ -104,6 +304,7 @@ class PlaylistManager:
         elif to_index <= self.current_index < from_index:
             self.current_index += 1
             
+        self._record('move', from_index=from_index, to_index=to_index)
         return True
     
     def reverse_tracks(self):
@@ -112,12 +313,14 @@ class PlaylistManager:
             return False
             
         self.tracks.reverse()
-        self._update_indices()
+        self._records.reverse()
+        self._positions = None
         
         # Aggiorna l'indice corrente se una traccia è selezionata
         if self.current_index >= 0:
             self.current_index = len(self.tracks) - 1 - self.current_index
             
+        self._record('reverse')
         return True
         
     def get_track(self, index: int) -> Optional[AudioTrack]:
@@ -134,6 +337,7 @@ class PlaylistManager:
         """Passa alla traccia successiva"""
         if self.current_index < len(self.tracks) - 1:
             self.current_index += 1
+            self._record('current', index=self.current_index)
             return self.get_current_track()
         return None
         
@@ -141,6 +345,7 @@ class PlaylistManager:
         """Passa alla traccia precedente"""
         if self.current_index > 0:
             self.current_index -= 1
+            self._record('current', index=self.current_index)
             return self.get_current_track()
         return None
         
@@ -148,6 +353,7 @@ class PlaylistManager:
         """Imposta la traccia corrente per indice"""
         if 0 <= index < len(self.tracks):
             self.current_index = index
+            self._record('current', index=index)
             return self.get_current_track()
         return None
         
@@ -162,26 +368,30 @@ class PlaylistManager:
     def clear(self):
         """Svuota la playlist"""
         self.tracks.clear()
+        self._records.clear()
+        self.hotkeys.clear()
+        self._positions = None
         self.current_index = -1
+        self._record('clear')
         
     def get_track_count(self) -> int:
         """Ritorna il numero di tracce"""
         return len(self.tracks)
         
     def save_playlist(self, filepath: str, audio_config: dict = None) -> bool:
-        """Salva la playlist in un file JSON, opzionalmente con configurazione audio"""
+        """Salva la playlist in un file JSON (o binario .amshow), opzionalmente con configurazione audio"""
         try:
-            data = {
-                'tracks': [track.to_dict() for track in self.tracks],
-                'current_index': self.current_index
-            }
+            data = self.to_dict()
             
             # Aggiungi configurazione audio se fornita
             if audio_config:
                 data['audio_config'] = audio_config
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Scrittura atomica: un crash a metà non corrompe lo show
+            if filepath.lower().endswith(SHOW_EXTENSION):
+                write_show(filepath, data)
+            else:
+                atomic_write_json(filepath, data, indent=2)
                 
             self.playlist_file = filepath
             return True
@@ -190,14 +400,16 @@ class PlaylistManager:
             return False
             
     def load_playlist(self, filepath: str) -> bool:
-        """Carica una playlist da un file JSON"""
+        """Carica una playlist da un file JSON o binario (.amshow, riconosciuto dalla firma)"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if is_show_file(filepath):
+                with ShowFile(filepath) as show:
+                    data = show.to_dict()
+            else:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
                 
-            self.tracks = [AudioTrack.from_dict(track_data) for track_data in data['tracks']]
-            self.current_index = data.get('current_index', -1)
-            self._update_indices()
+            self.from_dict(data)
             
             self.playlist_file = filepath
             
@@ -208,46 +420,182 @@ class PlaylistManager:
             print(f"Errore caricamento playlist: {e}")
             return False, None
             
-    def _update_indices(self):
-        """Aggiorna gli indici di tutte le tracce"""
-        for i, track in enumerate(self.tracks):
-            track.index = i
+    def to_dict(self) -> dict:
+        """Tracce e traccia corrente nel formato dei file playlist"""
+        return {
+            'tracks': [track.to_dict() for track in self.tracks],
+            'current_index': self.current_index
+        }
+    
+    def from_dict(self, data: dict):
+        """Sostituisce tracce e traccia corrente con quelle di un dizionario di to_dict"""
+        self.tracks = [AudioTrack.from_dict(track_data) for track_data in data['tracks']]
+        self.current_index = data.get('current_index', -1)
+        self._positions = None
+        self._rebuild_hotkeys()
+        self._records = [track.to_record() for track in self.tracks]
+        self._record('load', data=self.to_dict())
+    
+    def snapshot(self) -> PlaylistSnapshot:
+        """Stato immutabile dopo l'ultima modifica completa, da serializzare su un altro thread"""
+        return self._snapshot
+    
+    def _record(self, op: str, **args):
+        """Conta la modifica, pubblica il nuovo snapshot e passa la modifica al journal"""
+        self.revision += 1
+        if not self._replaying:
+            # Un cambio della sola traccia corrente (ogni GO) riusa la tupla dello snapshot precedente
+            self._publish(op != 'current')
+        if self.journal is not None:
+            args['op'] = op
+            self.journal.record(args)
+    
+    def _publish(self, tracks_changed: bool = True):
+        """Pubblica lo snapshot della revisione corrente"""
+        tracks = tuple(self._records) if tracks_changed else self._snapshot.tracks
+        self._snapshot = PlaylistSnapshot(self.revision, tracks, self.current_index)
+    
+    def _record_update(self, index: int, track: AudioTrack, *names: str):
+        """Registra i nuovi valori dei campi modificati di una traccia"""
+        self._records[index] = track.to_record()
+        self._record('update', index=index, fields={name: getattr(track, name) for name in names})
+    
+    def apply_changes(self, changes: List[dict]) -> int:
+        """Riapplica le modifiche lette da un journal; ritorna quante sono state applicate"""
+        journal, self.journal = self.journal, None  # La riapplicazione non va registrata di nuovo
+        self._replaying = True
+        applied = 0
+        try:
+            for change in changes:
+                try:
+                    self._apply_change(change)
+                    applied += 1
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    print(f"Modifica del journal non applicabile {change}: {e}")
+        finally:
+            self.journal = journal
+            self._replaying = False
+            self._publish()
+        return applied
+    
+    def _apply_change(self, change: dict):
+        """Riapplica una singola modifica"""
+        op = change['op']
+        if op == 'add':
+            track = AudioTrack.from_dict(change['track'])
+            self.tracks.append(track)
+            self._records.append(track.to_record())
+            self._positions = None
+            self._record('add', track=change['track'])
+        elif op == 'remove':
+            self.remove_track(change['index'])
+        elif op == 'move':
+            self.move_track(change['from_index'], change['to_index'])
+        elif op == 'reverse':
+            self.reverse_tracks()
+        elif op == 'clear':
+            self.clear()
+        elif op == 'current':
+            self.set_current_track(change['index'])
+        elif op == 'load':
+            self.from_dict(change['data'])
+        elif op == 'durations':
+            for index, duration in change['durations']:
+                track = self.tracks[index]
+                track.duration = duration
+                self._records[index] = track.to_record()
+            self._record('durations', durations=change['durations'])
+        elif op == 'update':
+            index = change['index']
+            track = self.tracks[index]
+            fields = [name for name in change['fields'] if name in _TRACK_FIELDS and name != 'hotkey']
+            for name in fields:
+                setattr(track, name, change['fields'][name])
+            self._record_update(index, track, *fields)
+            if 'hotkey' in change['fields']:
+                self.update_track_hotkey(index, change['fields']['hotkey'])
+        else:
+            raise ValueError(f"operazione sconosciuta: {op}")
+    
+    def index_of(self, track: AudioTrack) -> int:
+        """Posizione di una traccia nella playlist (-1 se non presente)"""
+        if self._positions is None:
+            # Dopo rimozioni e riordini l'indice viene ricalcolato una volta sola, alla prima richiesta
+            self._positions = {t.uid: i for i, t in enumerate(self.tracks)}
+        index = self._positions.get(track.uid, -1)
+        return index if index >= 0 and self.tracks[index] is track else -1
+    
+    def _rebuild_hotkeys(self):
+        """Ricostruisce l'indice degli hotkey; un hotkey duplicato resta solo sulla prima traccia"""
+        self.hotkeys = {}
+        for track in self.tracks:
+            if not track.hotkey:
+                continue
+            if track.hotkey in self.hotkeys:
+                print(f"Hotkey {track.hotkey} duplicato: rimosso da '{track.title}' "
+                      f"(resta su '{self.hotkeys[track.hotkey].title}')")
+                track.hotkey = ""
+            else:
+                self.hotkeys[track.hotkey] = track
             
     def update_track_duration(self, index: int, duration: float):
         """Aggiorna la durata di una traccia"""
         track = self.get_track(index)
-        if track:
+        if track and track.duration != duration:
             track.duration = duration
+            self._record_update(index, track, 'duration')
     
     def update_track_notes(self, index: int, notes: str):
         """Aggiorna le note di una traccia"""
         track = self.get_track(index)
         if track:
             track.notes = notes
+            self._record_update(index, track, 'notes')
             
     def update_track_color(self, index: int, color: str):
         """Aggiorna il colore di una traccia"""
         track = self.get_track(index)
         if track:
             track.color = color
+            self._record_update(index, track, 'color')
             
     def update_track_loop(self, index: int, loop: bool):
         """Aggiorna lo stato loop di una traccia"""
         track = self.get_track(index)
         if track:
             track.loop = loop
+            self._record_update(index, track, 'loop')
             
-    def update_track_hotkey(self, index: int, hotkey: str):
-        """Aggiorna l'hotkey di una traccia"""
+    def update_track_hotkey(self, index: int, hotkey: str) -> Optional[AudioTrack]:
+        """Aggiorna l'hotkey di una traccia
+        
+        Un hotkey già usato viene tolto alla traccia che lo aveva, che viene restituita.
+        """
         track = self.get_track(index)
-        if track:
-            track.hotkey = hotkey
+        if not track:
+            return None
+        
+        if self.hotkeys.get(track.hotkey) is track:
+            del self.hotkeys[track.hotkey]
+        track.hotkey = hotkey
+        
+        previous = self.hotkeys.get(hotkey) if hotkey else None
+        if previous is not None and previous is not track:
+            previous.hotkey = ""
+            self._records[self.index_of(previous)] = previous.to_record()
+        else:
+            previous = None
+        if hotkey:
+            self.hotkeys[hotkey] = track
+        self._record_update(index, track, 'hotkey')
+        return previous
     
     def update_track_volume(self, index: int, volume: int):
         """Aggiorna il volume personalizzato di una traccia (0-100)"""
         track = self.get_track(index)
         if track:
             track.volume = max(0, min(100, volume))
+            self._record_update(index, track, 'volume')
     
     def update_track_trim(self, index: int, start_time: float, end_time: float):
         """Aggiorna i tempi di inizio e fine di una traccia"""
@@ -256,10 +604,34 @@ class PlaylistManager:
             track.start_time = max(0.0, start_time)
             track.end_time = max(0.0, end_time)
             # Se end_time è 0, significa nessun trim finale
+            self._record_update(index, track, 'start_time', 'end_time')
+    
+    def update_track_fades(self, index: int, fade_in: float, fade_out: float, crossfade: float):
+        """Aggiorna le durate delle dissolvenze di una traccia"""
+        track = self.get_track(index)
+        if track:
+            track.fade_in = max(0.0, fade_in)
+            track.fade_out = max(0.0, fade_out)
+            track.crossfade = max(0.0, crossfade)
+            self._record_update(index, track, 'fade_in', 'fade_out', 'crossfade')
             
+    def update_track_continue(self, index: int, continue_mode: str, pre_wait: float):
+        """Aggiorna l'avvio automatico della traccia successiva e l'attesa di questa traccia"""
+        track = self.get_track(index)
+        if track and continue_mode in CONTINUE_MODES:
+            track.continue_mode = continue_mode
+            track.pre_wait = max(0.0, pre_wait)
+            self._record_update(index, track, 'continue_mode', 'pre_wait')
+    
+    def get_continuation(self, index: int) -> Optional[CueContinuation]:
+        """Traccia da armare per l'avvio automatico dopo quella all'indice dato (None = nessuna)"""
+        track = self.get_track(index)
+        next_track = self.get_track(index + 1)
+        if not track or not next_track or track.continue_mode not in ("follow", "continue"):
+            return None
+        return CueContinuation(next_track, track.continue_mode, next_track.pre_wait)
+    
     def get_track_by_hotkey(self, hotkey: str) -> Optional[AudioTrack]:
         """Trova una traccia per hotkey"""
-        for track in self.tracks:
-            if track.hotkey == hotkey:
-                return track
-        return None
+        # L'indice punta alle tracce, non alle posizioni: spostamenti e inversioni non lo alterano
+        return self.hotkeys.get(hotkey)
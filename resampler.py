@@ -0,0 +1,146 @@
+"""
+Resampler Module
+Conversione di frequenza di campionamento polifase, alla decodifica o a blocchi durante lo streaming
+"""
+
+from math import gcd
+
+import numpy as np
+
+
+# Passaggi per lo zero del filtro prototipo per lato e parametro della finestra di Kaiser
+# (~90 dB di attenuazione in banda oscura)
+HALF_ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+# Frame di uscita calcolati per iterazione dall'implementazione NumPy
+CHUNK_FRAMES = 8192
+
+
+def resample(audio_data: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Converte audio float32 (frame, canali) da src_rate a dst_rate
+
+    Usa scipy.signal.resample_poly se disponibile, altrimenti un filtro polifase equivalente
+    in NumPy.
+    """
+    if src_rate == dst_rate:
+        return audio_data
+
+    divisor = gcd(int(src_rate), int(dst_rate))
+    up = int(dst_rate) // divisor
+    down = int(src_rate) // divisor
+
+    try:
+        from scipy.signal import resample_poly
+    except ImportError:
+        return _resample_poly(audio_data, up, down)
+    return resample_poly(audio_data, up, down, axis=0).astype(np.float32)
+
+
+def _design_filter(up: int, down: int) -> np.ndarray:
+    """Filtro passa-basso sinc finestrato per l'interpolazione di un fattore up"""
+    factor = max(up, down)
+    taps = 2 * HALF_ZERO_CROSSINGS * factor + 1
+    cutoff = 1.0 / factor  # Frazione di Nyquist alla frequenza sovracampionata
+    t = np.arange(taps) - (taps - 1) / 2.0
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(taps, KAISER_BETA)
+    return h * up  # Compensa l'inserimento degli zeri
+
+
+def _resample_poly(audio_data: np.ndarray, up: int, down: int) -> np.ndarray:
+    """Sovracampiona di up, filtra e sottocampiona di down calcolando solo i campioni di uscita
+
+    Il filtro è scomposto in up fasi da K coefficienti: l'uscita n usa la fase
+    (n * down + centro) % up applicata ai K campioni di ingresso che terminano in
+    (n * down + centro) // up.
+    """
+    h = _design_filter(up, down)
+    center = (len(h) - 1) // 2
+    phase_taps = -(-len(h) // up)  # K = ceil(len(h) / up)
+
+    # Matrice polifase: phases[p, k] = h[p + k * up]
+    padded = np.zeros(phase_taps * up, dtype=np.float64)
+    padded[:len(h)] = h
+    phases = padded.reshape(phase_taps, up).T.astype(np.float32)
+
+    in_frames, channels = audio_data.shape
+    out_frames = -(-in_frames * up // down)
+
+    # Zeri ai bordi per evitare controlli sugli indici
+    source = np.zeros((in_frames + 2 * phase_taps + 1, channels), dtype=np.float32)
+    source[phase_taps:phase_taps + in_frames] = audio_data
+    offsets = phase_taps - np.arange(phase_taps)
+
+    output = np.empty((out_frames, channels), dtype=np.float32)
+    for first in range(0, out_frames, CHUNK_FRAMES):
+        n = np.arange(first, min(first + CHUNK_FRAMES, out_frames), dtype=np.int64)
+        position = n * down + center
+        base = position // up
+        phase = position % up
+        window = source[base[:, np.newaxis] + offsets[np.newaxis, :]]  # (frame, K, canali)
+        output[first:first + len(n)] = np.einsum('nk,nkc->nc', phases[phase], window)
+    return output
+
+
+class StreamResampler:
+    """Conversione polifase a blocchi con lo stesso filtro di _resample_poly
+
+    L'uscita n usa gli ingressi fino a (n * down + centro) // up: process ritorna solo le uscite
+    già calcolabili e conserva gli ingressi che servono alle successive, flush completa la coda
+    finale. reset(n) riparte dall'uscita n, dando lo stesso risultato della conversione completa.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, channels: int):
+        divisor = gcd(int(src_rate), int(dst_rate))
+        self.up = int(dst_rate) // divisor
+        self.down = int(src_rate) // divisor
+        self.channels = channels
+        h = _design_filter(self.up, self.down)
+        self.center = (len(h) - 1) // 2
+        self.taps = -(-len(h) // self.up)
+        padded = np.zeros(self.taps * self.up, dtype=np.float64)
+        padded[:len(h)] = h
+        self.phases = padded.reshape(self.taps, self.up).T.astype(np.float32)
+        self.reset(0)
+
+    def output_frames(self, input_frames: int) -> int:
+        """Frame di uscita di un file di input_frames frame"""
+        return -(-input_frames * self.up // self.down)
+
+    def max_output(self, input_frames: int) -> int:
+        """Frame massimi ritornati da process per un blocco di input_frames frame"""
+        return self.output_frames(input_frames) + 1
+
+    def _first_input(self, out_frame: int) -> int:
+        """Primo frame di ingresso letto dall'uscita out_frame (negativo = zeri prima dell'inizio)"""
+        return (out_frame * self.down + self.center) // self.up - self.taps + 1
+
+    def reset(self, out_frame: int) -> int:
+        """Riparte dall'uscita out_frame; ritorna il frame di ingresso da cui leggere"""
+        self.next_out = out_frame
+        self.offset = self._first_input(out_frame)  # Frame di ingresso del primo campione in history
+        self.history = np.zeros((max(0, -self.offset), self.channels), dtype=np.float32)
+        return max(0, self.offset)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Aggiunge un blocco di ingresso (frame, canali); ritorna le nuove uscite"""
+        data = np.concatenate((self.history, block)) if len(self.history) else block
+        available = self.offset + len(data)
+        last = max(self.next_out, -(-(available * self.up - self.center) // self.down))
+
+        n = np.arange(self.next_out, last, dtype=np.int64)
+        position = n * self.down + self.center
+        base = position // self.up - self.offset
+        window = data[base[:, np.newaxis] - np.arange(self.taps)[np.newaxis, :]]  # (frame, K, canali)
+        output = np.einsum('nk,nkc->nc', self.phases[position % self.up], window)
+
+        # Conserva solo gli ingressi necessari alle prossime uscite
+        self.next_out = last
+        keep = max(0, self._first_input(last) - self.offset)
+        self.history = data[keep:].copy()
+        self.offset += keep
+        return output.astype(np.float32, copy=False)
+
+    def flush(self) -> np.ndarray:
+        """Uscite finali, calcolate con zeri dopo la fine dell'ingresso"""
+        return self.process(np.zeros((self.taps + self.center // self.up + 1, self.channels),
+                                     dtype=np.float32))
@@ -0,0 +1,199 @@
+"""
+Show Format Module
+Formato binario compatto (.amshow) per gli show, con indice delle tracce e lettura su richiesta
+"""
+
+import json
+import mmap
+import struct
+from typing import Iterator, Optional
+
+from persistence import atomic_write_bytes
+
+
+SHOW_EXTENSION = ".amshow"
+
+# Layout del file:
+#   intestazione | metadati JSON (tutto tranne le tracce) | record delle tracce | indice
+# L'indice contiene l'offset (u64) di ogni record, così la traccia i si legge senza
+# decodificare le precedenti.
+MAGIC = b"AMSHOW"
+VERSION = 1
+_HEADER = struct.Struct('<6sHIQQQ')  # magic, versione, tracce, offset metadati, record, indice
+_OFFSET = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+
+# Record compatto: tag 0, campi numerici e poi le stringhe con lunghezza (u32 + UTF-8).
+# Le tracce che non rispettano esattamente lo schema (chiavi o tipi diversi) vengono salvate
+# come JSON con tag 1, così la conversione resta senza perdite.
+_RECORD_PACKED = 0
+_RECORD_JSON = 1
+_NUMBERS = struct.Struct('<d?idddddd')
+_NUMBER_FIELDS = ('duration', 'loop', 'volume', 'start_time', 'end_time',
+                  'fade_in', 'fade_out', 'crossfade', 'pre_wait')
+_NUMBER_TYPES = (float, bool, int, float, float, float, float, float, float)
+_STRING_FIELDS = ('filepath', 'title', 'notes', 'color', 'hotkey', 'continue_mode')
+# Ordine delle chiavi di AudioTrack.to_dict
+_TRACK_KEYS = ('filepath', 'title', 'duration', 'notes', 'color', 'loop', 'hotkey', 'volume',
+               'start_time', 'end_time', 'fade_in', 'fade_out', 'crossfade', 'continue_mode',
+               'pre_wait')
+
+
+def is_show_file(filepath: str) -> bool:
+    """Verifica dalla firma iniziale se il file è nel formato binario"""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _encode_track(track: dict) -> bytes:
+    """Record binario di una traccia (nel formato di AudioTrack.to_dict)"""
+    if len(track) == len(_TRACK_KEYS) and all(key in track for key in _TRACK_KEYS):
+        numbers = [track[name] for name in _NUMBER_FIELDS]
+        strings = [track[name] for name in _STRING_FIELDS]
+        if (all(type(value) is kind for value, kind in zip(numbers, _NUMBER_TYPES))
+                and all(type(value) is str for value in strings)
+                and -2 ** 31 <= track['volume'] < 2 ** 31):
+            try:
+                parts = [bytes([_RECORD_PACKED]), _NUMBERS.pack(*numbers)]
+                for value in strings:
+                    encoded = value.encode('utf-8')
+                    parts.append(_LENGTH.pack(len(encoded)))
+                    parts.append(encoded)
+                return b"".join(parts)
+            except UnicodeEncodeError:
+                pass  # Surrogati non codificabili in UTF-8: vanno salvati come JSON
+
+    return bytes([_RECORD_JSON]) + json.dumps(track, separators=(',', ':')).encode('ascii')
+
+
+def _decode_track(data, offset: int, end: int) -> dict:
+    """Traccia dal record binario tra offset ed end"""
+    tag = data[offset]
+    if tag == _RECORD_JSON:
+        return json.loads(bytes(data[offset + 1:end]).decode('ascii'))
+    if tag != _RECORD_PACKED:
+        raise ValueError(f"Record traccia sconosciuto: {tag}")
+
+    values = dict(zip(_NUMBER_FIELDS, _NUMBERS.unpack_from(data, offset + 1)))
+    position = offset + 1 + _NUMBERS.size
+    for name in _STRING_FIELDS:
+        (length,) = _LENGTH.unpack_from(data, position)
+        position += _LENGTH.size
+        values[name] = bytes(data[position:position + length]).decode('utf-8')
+        position += length
+    return {key: values[key] for key in _TRACK_KEYS}
+
+
+def write_show(filepath: str, data: dict):
+    """Salva uno show (stesso dizionario dei file JSON: tracks, current_index, audio_config...)"""
+    meta = {key: value for key, value in data.items() if key != 'tracks'}
+    meta_bytes = json.dumps(meta, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    tracks = data.get('tracks', [])
+    meta_offset = _HEADER.size
+    records_offset = meta_offset + len(meta_bytes)
+
+    records = []
+    offsets = []
+    position = records_offset
+    for track in tracks:
+        record = _encode_track(track)
+        offsets.append(position)
+        records.append(record)
+        position += len(record)
+
+    index = b"".join(_OFFSET.pack(offset) for offset in offsets)
+    header = _HEADER.pack(MAGIC, VERSION, len(tracks), meta_offset, records_offset, position)
+    atomic_write_bytes(filepath, b"".join([header, meta_bytes] + records + [index]))
+
+
+def read_show(filepath: str) -> dict:
+    """Legge uno show completo nel formato dei file JSON"""
+    with ShowFile(filepath) as show:
+        return show.to_dict()
+
+
+class ShowFile:
+    """Show binario aperto in sola lettura
+
+    L'apertura legge solo intestazione e metadati; le tracce vengono decodificate quando
+    richieste, usando l'indice per andare direttamente al record.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise ValueError(f"File show non valido: {filepath}")
+
+        try:
+            magic, version, count, meta_offset, records_offset, index_offset = \
+                _HEADER.unpack_from(self._data, 0)
+            if magic != MAGIC:
+                raise ValueError(f"File show non valido: {filepath}")
+            if version > VERSION:
+                raise ValueError(f"Versione del file show non supportata: {version}")
+            if index_offset + count * _OFFSET.size > len(self._data):
+                raise ValueError(f"File show troncato: {filepath}")
+            self.meta = json.loads(bytes(self._data[meta_offset:records_offset]).decode('utf-8'))
+        except (struct.error, ValueError):
+            self.close()
+            raise
+
+        self._count = count
+        self._index_offset = index_offset
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> dict:
+        """Traccia all'indice dato (dizionario come in AudioTrack.to_dict)"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+
+        (start,) = _OFFSET.unpack_from(self._data, self._index_offset + index * _OFFSET.size)
+        if index + 1 < self._count:
+            (end,) = _OFFSET.unpack_from(self._data, self._index_offset + (index + 1) * _OFFSET.size)
+        else:
+            end = self._index_offset
+        return _decode_track(self._data, start, end)
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(self._count):
+            yield self[index]
+
+    @property
+    def current_index(self) -> int:
+        return self.meta.get('current_index', -1)
+
+    @property
+    def audio_config(self) -> Optional[dict]:
+        return self.meta.get('audio_config')
+
+    def to_dict(self) -> dict:
+        """Show completo nel formato dei file JSON"""
+        data = {'tracks': list(self)}
+        data.update(self.meta)
+        return data
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
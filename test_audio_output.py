@@ -0,0 +1,128 @@
+"""
+Test del mixer di AudioOutput
+Lo stream audio è simulato: il callback viene chiamato direttamente dal test
+"""
+
+import importlib.util
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# Nessun dispositivo richiesto: lo stream viene comunque sostituito da FakeStream, quindi senza
+# sounddevice basta un modulo vuoto per l'import (rimosso subito, non tocca gli altri test)
+_NO_SOUNDDEVICE = importlib.util.find_spec('sounddevice') is None
+if _NO_SOUNDDEVICE:
+    sys.modules['sounddevice'] = types.ModuleType('sounddevice')
+try:
+    import audio_manager
+    from audio_manager import AudioOutput, PCMBuffer
+finally:
+    if _NO_SOUNDDEVICE:
+        del sys.modules['sounddevice']
+
+RATE = 44100
+BLOCK = 256
+
+
+class FakeStream:
+    """OutputStream che non apre alcun dispositivo: render() esegue un ciclo di callback"""
+
+    def __init__(self, callback=None, samplerate=RATE, blocksize=0, **kwargs):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.latency = 0.0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def render(self, frames: int = BLOCK) -> np.ndarray:
+        outdata = np.zeros((frames, 2), dtype=np.float32)
+        self.callback(outdata, frames, None, types.SimpleNamespace(output_underflow=False))
+        return outdata
+
+
+class TrackedBuffer(PCMBuffer):
+    """Buffer costante che registra il proprio rilascio"""
+
+    def __init__(self, value: float, seconds: float = 1.0):
+        super().__init__(np.full((int(seconds * RATE), 2), value, dtype=np.float32), RATE)
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def output(monkeypatch):
+    monkeypatch.setattr(audio_manager.sd, 'OutputStream', FakeStream, raising=False)
+    monkeypatch.setattr(audio_manager.sd, 'query_devices',
+                        lambda device=None, kind=None: {'max_output_channels': 2}, raising=False)
+    output = AudioOutput(sample_rate=RATE)
+    yield output
+    output.close()
+
+
+def _fail_stream(monkeypatch):
+    def fail(**kwargs):
+        raise RuntimeError("dispositivo non disponibile")
+    monkeypatch.setattr(audio_manager.sd, 'OutputStream', fail, raising=False)
+
+
+def test_hotkey_in_pausa_avvia_il_nuovo_cue(output):
+    """Pausa, poi un hotkey carica un cue sopra: il play riprende il vecchio e avvia il nuovo"""
+    output.load_buffer(TrackedBuffer(0.25))
+    assert output.play()
+    output.stream.render()
+    output.pause()
+
+    output.load_buffer(TrackedBuffer(0.5), layer=True)
+    assert output.play()
+
+    assert not output.is_paused
+    assert output.is_current_playing
+    np.testing.assert_allclose(output.stream.render(), 0.75)
+
+
+def test_caricamento_durante_la_riproduzione_continua_a_suonare(output):
+    """Un cue caricato senza layer mentre la voce corrente suona parte al suo posto"""
+    output.load_buffer(TrackedBuffer(0.25))
+    output.play()
+    output.stream.render()
+
+    output.load_buffer(TrackedBuffer(0.5))
+
+    assert output.is_current_playing
+    np.testing.assert_allclose(output.stream.render(), 0.5)
+
+
+def test_caricamento_da_fermo_non_avvia(output):
+    """Senza riproduzione in corso il caricamento lascia la voce ferma"""
+    output.load_buffer(TrackedBuffer(0.5))
+
+    assert not output.is_current_playing
+
+
+def test_fire_senza_stream_rilascia_il_buffer(output, monkeypatch):
+    _fail_stream(monkeypatch)
+    buffer = TrackedBuffer(0.5)
+
+    assert output.fire(buffer) == -1
+    assert buffer.released
+
+
+def test_arm_senza_stream_rilascia_il_buffer(output, monkeypatch):
+    _fail_stream(monkeypatch)
+    buffer = TrackedBuffer(0.5)
+
+    assert output.arm(buffer) == -1
+    assert buffer.released
+    assert output.standby_voice is None
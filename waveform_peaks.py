@@ -0,0 +1,182 @@
+"""
+Waveform Peaks Module
+Piramide di picchi min/max per disegnare la forma d'onda a qualsiasi zoom, con cache su disco
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class PeakPyramid:
+    """Picchi min/max (mono) a più risoluzioni: ogni livello dimezza quello precedente"""
+
+    def __init__(self, sample_rate: int, frames: int, bin_frames: int,
+                 levels: List[Tuple[np.ndarray, np.ndarray]]):
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.bin_frames = bin_frames  # Frame per picco del livello 0
+        self.levels = levels  # [(minimi, massimi), ...] dal più fine al più grossolano
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[np.ndarray], sample_rate: int,
+                    bin_frames: int = 256) -> 'PeakPyramid':
+        """Calcola la piramide in un'unica passata su blocchi (frame, canali)
+
+        I blocchi devono essere multipli di bin_frames, tranne l'ultimo.
+        """
+        mins, maxs = [], []
+        frames = 0
+        for block in blocks:
+            if len(block) == 0:
+                continue
+            starts = np.arange(0, len(block), bin_frames)
+            mins.append(np.minimum.reduceat(block.min(axis=1), starts))
+            maxs.append(np.maximum.reduceat(block.max(axis=1), starts))
+            frames += len(block)
+
+        level_min = np.concatenate(mins).astype(np.float32) if mins else np.zeros(0, np.float32)
+        level_max = np.concatenate(maxs).astype(np.float32) if maxs else np.zeros(0, np.float32)
+        levels = [(level_min, level_max)]
+        while len(level_min) > 1:
+            # Livello successivo: coppie di picchi adiacenti (l'ultimo dispari resta da solo)
+            starts = np.arange(0, len(level_min), 2)
+            level_min = np.minimum.reduceat(level_min, starts)
+            level_max = np.maximum.reduceat(level_max, starts)
+            levels.append((level_min, level_max))
+        return cls(sample_rate, frames, bin_frames, levels)
+
+    @property
+    def duration(self) -> float:
+        """Durata in secondi"""
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def render(self, start_seconds: float, end_seconds: float,
+               pixels: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Picchi dell'intervallo ridotti a circa pixels colonne: (tempi, minimi, massimi)
+
+        Usa il livello più grossolano con almeno un picco per pixel, per cui il costo dipende
+        dalla larghezza della vista e non dalla durata del file.
+        """
+        start = max(0, int(start_seconds * self.sample_rate))
+        end = min(self.frames, int(end_seconds * self.sample_rate))
+        pixels = max(1, pixels)
+        if end <= start or not self.levels:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+
+        level = 0
+        frames_per_pixel = (end - start) / pixels
+        while (level + 1 < len(self.levels)
+               and self.bin_frames * (2 ** (level + 1)) <= frames_per_pixel):
+            level += 1
+        level_bin = self.bin_frames * (2 ** level)
+        level_min, level_max = self.levels[level]
+
+        first = start // level_bin
+        last = min(len(level_min), -(-end // level_bin))
+        level_min = level_min[first:last]
+        level_max = level_max[first:last]
+
+        if len(level_min) > pixels:
+            edges = np.unique(np.linspace(0, len(level_min), pixels + 1).astype(np.int64)[:-1])
+            level_min = np.minimum.reduceat(level_min, edges)
+            level_max = np.maximum.reduceat(level_max, edges)
+        else:
+            edges = np.arange(len(level_min))
+
+        times = (first + edges) * level_bin / self.sample_rate
+        return times, level_min, level_max
+
+    def save(self, path: Path, source_size: int, source_mtime: float):
+        """Salva la piramide (scrittura atomica) con dimensione e mtime del file sorgente"""
+        arrays = {'meta': np.array([self.sample_rate, self.frames, self.bin_frames,
+                                    source_size, source_mtime], dtype=np.float64)}
+        for index, (level_min, level_max) in enumerate(self.levels):
+            arrays[f'min_{index}'] = level_min
+            arrays[f'max_{index}'] = level_max
+
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, source_size: int, source_mtime: float) -> Optional['PeakPyramid']:
+        """Carica una piramide salvata; None se assente o se il file sorgente è cambiato"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                sample_rate, frames, bin_frames, size, mtime = data['meta']
+                if int(size) != source_size or mtime != source_mtime:
+                    return None
+                levels = []
+                index = 0
+                while f'min_{index}' in data:
+                    levels.append((data[f'min_{index}'], data[f'max_{index}']))
+                    index += 1
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(int(sample_rate), int(frames), int(bin_frames), levels)
+
+
+class PeakCache:
+    """Piramidi di picchi in memoria e su disco, indicizzate per percorso, dimensione e mtime"""
+
+    def __init__(self, directory: Path, bin_frames: int = 256, block_bins: int = 1024):
+        self.directory = Path(directory)
+        self.bin_frames = bin_frames
+        self.block_frames = bin_frames * block_bins  # Frame letti per blocco durante il calcolo
+        self.entries = {}  # (path, size, mtime) -> PeakPyramid
+        self.lock = threading.Lock()
+
+    def _disk_path(self, filepath: str) -> Path:
+        """File della cache su disco per un file audio"""
+        digest = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return self.directory / f"{digest}.npz"
+
+    def cached(self, filepath: str) -> Optional[PeakPyramid]:
+        """Piramide già in memoria per la versione attuale del file, senza leggere nulla"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        with self.lock:
+            return self.entries.get((os.path.abspath(filepath), stat.st_size, stat.st_mtime))
+
+    def get(self, filepath: str, buffer) -> Optional[PeakPyramid]:
+        """Piramide del file: dalla memoria, dal disco o calcolata dal buffer (e salvata)
+
+        buffer è il PCMBuffer del file; viene letto con iter_blocks solo se serve ricalcolare.
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime)
+
+        with self.lock:
+            pyramid = self.entries.get(key)
+        if pyramid is not None:
+            return pyramid
+
+        disk_path = self._disk_path(filepath)
+        pyramid = PeakPyramid.load(disk_path, stat.st_size, stat.st_mtime)
+        if pyramid is None or pyramid.sample_rate != buffer.sample_rate:
+            pyramid = PeakPyramid.from_blocks(buffer.iter_blocks(self.block_frames),
+                                              buffer.sample_rate, self.bin_frames)
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                pyramid.save(disk_path, stat.st_size, stat.st_mtime)
+            except OSError as e:
+                print(f"Errore salvataggio picchi waveform: {e}")
+
+        with self.lock:
+            # Le versioni precedenti dello stesso file non servono più
+            for old_key in [k for k in self.entries if k[0] == key[0]]:
+                del self.entries[old_key]
+            self.entries[key] = pyramid
+        return pyramid